@@ -1,8 +1,58 @@
 from maa.agent.agent_server import AgentServer
 from maa.custom_action import CustomAction
-from maa.context import Context
+from maa.context import Context, ContextEventSink
+from maa.event_sink import NotificationType
 
-from common import click_box_center
+import profiling
+from checkpoint import run_checkpoint
+from common import (
+    click_box_center,
+    collect_node_chain,
+    get_node_custom_action,
+    parse_json_param,
+    wait_for_screen_stable,
+)
+from constants import (
+    ADAPTIVE_DELAY_DEFAULT_MAX,
+    ADAPTIVE_DELAY_NODE_PREFIX,
+    ADAPTIVE_DELAY_START_NODE,
+    LEVELING_EXIT_NODE,
+    LEVELING_STEP_PREFIX,
+)
+from run_state import get_run_state
+from stall import stall_watchdog
+
+
+def _collect_adaptive_delay_nodes(context: Context) -> dict[str, float]:
+    baselines = {}
+    chain = collect_node_chain(context, ADAPTIVE_DELAY_START_NODE, ADAPTIVE_DELAY_NODE_PREFIX, (LEVELING_EXIT_NODE,))
+    for node_name, node_data in chain.items():
+        if get_node_custom_action(node_data) == "PreciseClick":
+            baselines[node_name] = (node_data.get("pre_delay", 0) + node_data.get("post_delay", 0)) / 1000
+    return baselines
+
+
+@AgentServer.custom_action("EnableAdaptiveDelay")
+class EnableAdaptiveDelay(CustomAction):
+    def run(
+        self,
+        context: Context,
+        argv: CustomAction.RunArg,
+    ) -> bool:
+        param = parse_json_param(argv.custom_action_param)
+        max_delay = param.get("max_delay", ADAPTIVE_DELAY_DEFAULT_MAX) / 1000
+
+        state = get_run_state(context)
+        if state.adaptive_delays is None:
+            baselines = _collect_adaptive_delay_nodes(context)
+            context.override_pipeline({node_name: {"pre_delay": 0, "post_delay": 0} for node_name in baselines})
+        else:
+            baselines = {node_name: baseline for node_name, (_, baseline) in state.adaptive_delays.items()}
+        if not baselines:
+            return False
+
+        state.adaptive_delays = {node_name: (max_delay, baseline) for node_name, baseline in baselines.items()}
+        return True
 
 
 @AgentServer.custom_action("PreciseClick")
@@ -12,4 +62,29 @@ class PreciseClick(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        return click_box_center(context, argv.box)
+        adaptive_delay = (get_run_state(context).adaptive_delays or {}).get(argv.node_name)
+        if adaptive_delay is None:
+            clicked = click_box_center(context, argv.box)
+        else:
+            max_delay, baseline = adaptive_delay
+            _, pre_wait = wait_for_screen_stable(context, max_delay)
+            clicked = click_box_center(context, argv.box)
+            _, post_wait = wait_for_screen_stable(context, max_delay)
+            profiling.count("saved_delay_ms", round(max(baseline - pre_wait - post_wait, 0) * 1000))
+
+        if clicked and argv.node_name.startswith(LEVELING_STEP_PREFIX):
+            run_checkpoint.record_step(argv.node_name)
+            stall_watchdog.note_progress(argv.node_name)
+        return clicked
+
+
+@AgentServer.context_sink()
+class LevelingStepSink(ContextEventSink):
+    def on_node_action(
+        self,
+        context: Context,
+        noti_type: NotificationType,
+        detail: ContextEventSink.NodeActionDetail,
+    ):
+        if noti_type == NotificationType.Succeeded and detail.name.startswith(LEVELING_STEP_PREFIX):
+            run_checkpoint.record_step(detail.name)
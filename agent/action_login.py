@@ -1,26 +1,51 @@
-import time
+import math
 
 from maa.agent.agent_server import AgentServer
 from maa.custom_action import CustomAction
 from maa.context import Context
 
 from common import (
+    box_center,
+    capture_frame,
     capture_image,
     click_box_center,
     click_key,
     click_point,
     find_server_ocr_result,
-    get_detail_value,
+    infer_server_grid,
+    is_hit,
+    pause,
+    plan_server_scroll_rows,
+    post_inputs,
     run_recognition,
+    snapshot_server_list,
+    wait_for_screen_change,
+    wait_for_screen_stable,
 )
 from constants import (
+    ESC_CHANGE_TIMEOUT,
+    SCREEN_SETTLE_TIMEOUT,
     SERVER_1000_LIST_ROI,
     SERVER_1000_SCROLL_CLICKS_PER_ATTEMPT,
     SERVER_1000_SEARCH_ATTEMPTS,
     SERVER_1_999_SCROLL_CLICKS_PER_ATTEMPT,
     SERVER_1_999_SEARCH_ATTEMPTS,
     SERVER_SCROLL_CLICK_INTERVAL,
+    SERVER_SCROLL_PROBE_CLICKS,
 )
+from row_ocr import run_row_ocr
+from run_state import get_current_server_id, get_run_state
+from server_index import server_list_index, server_tab
+
+
+def scroll_server_list_to_top(context: Context) -> bool:
+    image = capture_image(context)
+    tab_detail = run_recognition(context, "DeterminePage", image)
+    if not is_hit(tab_detail) or not click_box_center(context, tab_detail.best_result.box):
+        return False
+
+    wait_for_screen_change(context, image, SCREEN_SETTLE_TIMEOUT)
+    return True
 
 
 @AgentServer.custom_action("ScrollToTargetServer")
@@ -30,7 +55,7 @@ class ScrollToTargetServer(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        target_server_id = get_detail_value(context, "GetNextServer", "server_id")
+        target_server_id = get_current_server_id(context)
         if target_server_id is None:
             return False
 
@@ -41,39 +66,139 @@ class ScrollToTargetServer(CustomAction):
             max_search_attempts = SERVER_1_999_SEARCH_ATTEMPTS
             scroll_clicks_per_attempt = SERVER_1_999_SCROLL_CLICKS_PER_ATTEMPT
 
+        tab = server_tab(target_server_id)
+        rows_per_click = server_list_index.rows_per_click(tab)
+        known_offset = server_list_index.lookup_offset(tab, target_server_id)
+        scroll_offset = 0
+        server_list_index.session_offsets[tab] = scroll_offset
+        last_grid = None
+        last_clicks = 0
+        restarted = False
+        state = get_run_state(context)
+        state.server_list_snapshot = None
         for attempt in range(max_search_attempts):
-            image = capture_image(context)
-            reco_detail = run_recognition(
+            frame = capture_frame(context)
+            image = frame.image
+            reco_detail = run_row_ocr(
                 context,
                 "ChooseServerButton",
                 image,
-                {
-                    "ChooseServerButton": {
-                        "roi": SERVER_1000_LIST_ROI,
-                        "expected": rf".*(^|[^0-9]){target_server_id}([^0-9]|$).*",
-                    }
-                },
+                SERVER_1000_LIST_ROI,
+                rf".*(^|[^0-9]){target_server_id}([^0-9]|$).*",
+            )
+
+            grid = infer_server_grid(reco_detail)
+            if grid and last_grid and last_clicks:
+                scrolled_rows = (last_grid["base"] - grid["base"]) / grid["col_count"]
+                if scrolled_rows > 0:
+                    rows_per_click = scrolled_rows / last_clicks
+            if grid:
+                server_list_index.record(tab, scroll_offset, grid, rows_per_click)
+
+            matched_result, match_mode = find_server_ocr_result(
+                reco_detail,
+                target_server_id,
+                server_list_index.recorded_base(tab, scroll_offset),
             )
-            matched_result, _ = find_server_ocr_result(reco_detail, target_server_id)
             if matched_result:
+                state.server_list_snapshot = snapshot_server_list(
+                    frame,
+                    reco_detail,
+                    target_server_id,
+                    matched_result,
+                    match_mode,
+                )
                 return True
 
             if attempt == max_search_attempts - 1:
                 break
 
+            scroll_clicks = scroll_clicks_per_attempt
+            if scroll_offset == 0 and known_offset:
+                scroll_clicks = known_offset
+            elif grid:
+                scroll_rows = plan_server_scroll_rows(grid, target_server_id)
+                if scroll_rows is None:
+                    if restarted or not scroll_server_list_to_top(context):
+                        return False
+                    restarted = True
+                    known_offset = None
+                    scroll_offset = last_clicks = 0
+                    last_grid = None
+                    server_list_index.session_offsets[tab] = scroll_offset
+                    continue
+                if rows_per_click is None:
+                    scroll_clicks = max(min(scroll_rows, SERVER_SCROLL_PROBE_CLICKS), 1)
+                else:
+                    scroll_clicks = max(math.ceil(scroll_rows / rows_per_click), 1)
+
             down_arrow = run_recognition(context, "FindDownArrow", image)
             if not down_arrow or not down_arrow.hit or not down_arrow.best_result:
                 return False
 
-            box = down_arrow.best_result.box
-            for _ in range(scroll_clicks_per_attempt):
-                if not click_box_center(context, box):
-                    return False
-                time.sleep(SERVER_SCROLL_CLICK_INTERVAL)
+            click = ("click", *box_center(down_arrow.best_result.box))
+            if not post_inputs(context, [click] * scroll_clicks, SERVER_SCROLL_CLICK_INTERVAL).succeeded:
+                return False
+            pause(SERVER_SCROLL_CLICK_INTERVAL)
+
+            scroll_offset += scroll_clicks
+            server_list_index.session_offsets[tab] = scroll_offset
+            last_grid = grid
+            last_clicks = scroll_clicks
 
         return False
 
 
+def handle_login_popups(context: Context) -> None:
+    frame = capture_image(context)
+    while True:
+        has_popup = False
+        image = frame
+
+        announcement = run_recognition(context, "CheckAnnouncement", image)
+        if announcement and announcement.hit and announcement.best_result:
+            has_popup = True
+            frame, _ = wait_for_screen_stable(context, SCREEN_SETTLE_TIMEOUT)
+            announcement = run_recognition(context, "CheckAnnouncement", frame)
+            if is_hit(announcement):
+                click_box_center(context, announcement.best_result.box)
+                frame, _ = wait_for_screen_change(context, frame, SCREEN_SETTLE_TIMEOUT)
+
+        welfare = run_recognition(context, "CheckWelfare", image)
+        if welfare and welfare.hit and welfare.best_result:
+            has_popup = True
+            click_point(context, 680, 400)
+            frame, _ = wait_for_screen_change(context, frame, SCREEN_SETTLE_TIMEOUT)
+            click_key(context, 27)
+            frame, _ = wait_for_screen_change(context, frame, SCREEN_SETTLE_TIMEOUT)
+
+        return_gift = run_recognition(context, "CheckReturnGift", image)
+        if return_gift and return_gift.hit and return_gift.best_result:
+            has_popup = True
+            click_point(context, 680, 400)
+            frame, _ = wait_for_screen_change(context, frame, SCREEN_SETTLE_TIMEOUT)
+            click_key(context, 27)
+            frame, _ = wait_for_screen_change(context, frame, SCREEN_SETTLE_TIMEOUT)
+
+        if not has_popup:
+            break
+
+
+def dismiss_popups_by_esc(context: Context) -> None:
+    image = capture_image(context)
+    for _ in range(5):
+        click_key(context, 27)
+        image, changed = wait_for_screen_change(context, image, ESC_CHANGE_TIMEOUT)
+        if not changed:
+            break
+
+    remain_popup = run_recognition(context, "CheckRemainPopup", image)
+    if remain_popup and remain_popup.hit and remain_popup.best_result:
+        click_point(context, 680, 400)
+        wait_for_screen_change(context, image, SCREEN_SETTLE_TIMEOUT)
+        click_key(context, 27)
+
+
 @AgentServer.custom_action("HandleLoginPopups")
 class HandleLoginPopups(CustomAction):
     def run(
@@ -81,36 +206,7 @@ class HandleLoginPopups(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        while True:
-            has_popup = False
-            image = capture_image(context)
-
-            announcement = run_recognition(context, "CheckAnnouncement", image)
-            if announcement and announcement.hit and announcement.best_result:
-                has_popup = True
-                time.sleep(0.2)
-                click_box_center(context, announcement.best_result.box)
-                time.sleep(0.2)
-
-            welfare = run_recognition(context, "CheckWelfare", image)
-            if welfare and welfare.hit and welfare.best_result:
-                has_popup = True
-                click_point(context, 680, 400)
-                time.sleep(0.2)
-                click_key(context, 27)
-                time.sleep(0.2)
-
-            return_gift = run_recognition(context, "CheckReturnGift", image)
-            if return_gift and return_gift.hit and return_gift.best_result:
-                has_popup = True
-                click_point(context, 680, 400)
-                time.sleep(0.2)
-                click_key(context, 27)
-                time.sleep(0.2)
-
-            if not has_popup:
-                break
-
+        handle_login_popups(context)
         return True
 
 
@@ -121,15 +217,5 @@ class FastESC(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        for _ in range(5):
-            click_key(context, 27)
-            time.sleep(0.2)
-
-        image = capture_image(context)
-        remain_popup = run_recognition(context, "CheckRemainPopup", image)
-        if remain_popup and remain_popup.hit and remain_popup.best_result:
-            click_point(context, 680, 400)
-            time.sleep(0.2)
-            click_key(context, 27)
-
+        dismiss_popups_by_esc(context)
         return True
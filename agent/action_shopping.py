@@ -1,11 +1,11 @@
-import time
-
 from maa.agent.agent_server import AgentServer
 from maa.custom_action import CustomAction
 from maa.context import Context
 
-from common import capture_image, click_box_center, get_detail_value, get_recognition_box, parse_digits, run_recognition, send_focus_message
-from constants import SHOPPING_GIFT_COUNT_ROIS, SHOPPING_GIFT_OPTION_CENTERS
+from common import box_center, capture_image, click_box_center, input_text, pause, post_inputs, send_focus_message
+from constants import SHOPPING_GIFT_OPTION_CENTERS
+from reco_shopping import recognize_gift_panel
+from run_state import get_shopping_target, get_state_value
 
 
 @AgentServer.custom_action("PasteShoppingQuantity")
@@ -15,12 +15,12 @@ class PasteShoppingQuantity(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        quantity = get_detail_value(context, "FindShoppingFestivalTarget", "quantity")
+        shopping_target = get_shopping_target(context)
+        quantity = shopping_target.get("quantity") if shopping_target else None
         if quantity is None:
             return False
 
-        context.tasker.controller.post_input_text(str(quantity)).wait()
-        return True
+        return input_text(context, str(quantity))
 
 
 @AgentServer.custom_action("ClickShoppingFriendInput")
@@ -40,12 +40,11 @@ class PasteShoppingFriendName(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        friend_name = get_detail_value(context, "GetShoppingFriendName", "friend_name")
+        friend_name = get_state_value(context, "friend_name", "GetShoppingFriendName", "friend_name")
         if not friend_name:
             return False
 
-        context.tasker.controller.post_input_text(friend_name).wait()
-        return True
+        return input_text(context, friend_name)
 
 
 @AgentServer.custom_action("ClickShoppingFriendOption")
@@ -75,64 +74,48 @@ class ProcessShoppingFestivalGifts(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        image = capture_image(context)
-
-        select_box = get_recognition_box(context, image, "ShoppingFestivalGiftSelectTemplate")
-        minus_box = get_recognition_box(context, image, "ShoppingFestivalMinusTemplate")
-        plus_box = get_recognition_box(context, image, "ShoppingFestivalPlusTemplate")
-        send_box = get_recognition_box(context, image, "ShoppingFestivalSendTemplate")
-        if not select_box or not minus_box or not plus_box or not send_box:
+        panel = recognize_gift_panel(context, capture_image(context))
+        if not panel["controls_found"]:
             return False
 
-        gift_targets = []
-        for index, gift_roi in enumerate(SHOPPING_GIFT_COUNT_ROIS, start=1):
-            reco_detail = run_recognition(
-                context,
-                "ShoppingFestivalGiftCountOCR",
-                image,
-                {"ShoppingFestivalGiftCountOCR": {"roi": gift_roi}},
-            )
-
-            gift_text = ""
-            if reco_detail and reco_detail.hit and reco_detail.best_result:
-                gift_text = reco_detail.best_result.text or ""
-
-            digits = parse_digits(gift_text)
-            target_count = int(digits) if digits in {"1", "2", "3"} else 0
-
-            if target_count > 0:
-                gift_targets.append((index, target_count))
+        controls = panel["controls"]
+        select_box = controls["select"]
+        minus_box = controls["minus"]
+        plus_box = controls["plus"]
+        send_box = controls["send"]
 
+        gift_targets = [gift for gift in panel["gifts"] if gift["count"] > 0]
         if not gift_targets:
             send_focus_message(context, "购物节未识别到任何需要送字的数量")
             return True
 
-        gift_chars = ("木", "叶", "购", "物", "狂", "欢")
         current_count = 1
-        for index, target_count in gift_targets:
+        for gift in gift_targets:
+            index = gift["index"]
+            target_count = gift["count"]
             if not click_box_center(context, select_box):
                 return False
-            time.sleep(0.2)
+            pause(0.2)
 
             if index > len(SHOPPING_GIFT_OPTION_CENTERS):
                 return False
             if not click_box_center(context, SHOPPING_GIFT_OPTION_CENTERS[index - 1]):
                 return False
-            time.sleep(0.2)
+            pause(0.2)
 
             delta = target_count - current_count
             button_box = plus_box if delta > 0 else minus_box
-            for _ in range(abs(delta)):
-                if not click_box_center(context, button_box):
+            if delta:
+                batch = post_inputs(context, [("click", *box_center(button_box))] * abs(delta), 0.2)
+                if not batch.succeeded:
                     return False
-                time.sleep(0.2)
+                pause(0.2)
 
             if not click_box_center(context, send_box):
                 return False
-            time.sleep(0.2)
+            pause(0.2)
 
             current_count = target_count
-            gift_char = gift_chars[index - 1]
-            send_focus_message(context, f"已赠送 {gift_char} 字，数量 {target_count}")
+            send_focus_message(context, f"已赠送 {gift['char']} 字，数量 {target_count}")
 
         return True
@@ -2,7 +2,17 @@ from maa.agent.agent_server import AgentServer
 from maa.custom_action import CustomAction
 from maa.context import Context
 
-from common import get_detail_value
+from action_login import dismiss_popups_by_esc, handle_login_popups
+from common import collect_node_chain, format_next_item, input_text, send_focus_message
+from constants import (
+    LEVELING_EXIT_NODE,
+    LEVELING_START_STEP,
+    LEVELING_STEP_JUMP_NODE,
+    LEVELING_STEP_PREFIX,
+    STALL_WATCHDOG_NODE,
+)
+from run_state import get_current_server_id, get_state_value
+from stall import stall_watchdog
 
 
 @AgentServer.custom_action("PasteAccountName")
@@ -12,9 +22,65 @@ class PasteAccountName(CustomAction):
         context: Context,
         argv: CustomAction.RunArg,
     ) -> bool:
-        account_name = get_detail_value(context, "GetAccountPrefix", "AccountName")
+        account_name = get_state_value(context, "account_name", "GetAccountPrefix", "AccountName")
         if account_name is None:
             return False
 
-        context.tasker.controller.post_input_text(account_name).wait()
+        return input_text(context, account_name)
+
+
+@AgentServer.custom_action("JumpToLevelingStep")
+class JumpToLevelingStep(CustomAction):
+    def run(
+        self,
+        context: Context,
+        argv: CustomAction.RunArg,
+    ) -> bool:
+        best_result = argv.reco_detail.best_result if argv.reco_detail else None
+        detail = best_result.detail if best_result else None
+        step_name = detail.get("step") if isinstance(detail, dict) else None
+        if not step_name:
+            return False
+
+        return context.override_next(LEVELING_STEP_JUMP_NODE, [step_name])
+
+
+@AgentServer.custom_action("EnableStallWatchdog")
+class EnableStallWatchdog(CustomAction):
+    def run(
+        self,
+        context: Context,
+        argv: CustomAction.RunArg,
+    ) -> bool:
+        entry = f"[JumpBack]{STALL_WATCHDOG_NODE}"
+        chain = collect_node_chain(context, LEVELING_START_STEP, LEVELING_STEP_PREFIX, (LEVELING_EXIT_NODE,))
+        overrides = {}
+        for node_name, node_data in chain.items():
+            next_list = [name for name in map(format_next_item, node_data.get("next") or []) if name]
+            if entry in next_list:
+                continue
+            index = next_list.index(node_name) if node_name in next_list else len(next_list)
+            next_list.insert(index, entry)
+            overrides[node_name] = {"next": next_list}
+
+        if overrides:
+            context.override_pipeline(overrides)
+        stall_watchdog.reset()
+        return True
+
+
+@AgentServer.custom_action("RecoverFromStall")
+class RecoverFromStall(CustomAction):
+    def run(
+        self,
+        context: Context,
+        argv: CustomAction.RunArg,
+    ) -> bool:
+        server_id = get_current_server_id(context)
+        count = stall_watchdog.record_recovery(server_id)
+        send_focus_message(context, f"{server_id}服画面卡住，第 {count} 次尝试恢复")
+
+        dismiss_popups_by_esc(context)
+        handle_login_popups(context)
+        stall_watchdog.reset()
         return True
@@ -0,0 +1,213 @@
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy
+from maa.agent.agent_server import AgentServer
+
+from constants import CAPTURE_RETRY_INTERVAL, CAPTURE_STOP_TIMEOUT, CAPTURE_TIME_SMOOTHING
+
+_sequence = itertools.count(1)
+
+
+def capture_enabled() -> bool:
+    return os.environ.get("MAANOP_CAPTURE", "0") != "0"
+
+
+@dataclass(frozen=True)
+class Frame:
+    image: numpy.ndarray
+    seq: int
+    timestamp: float
+    received: float
+
+
+def next_frame(image, started: float) -> Frame:
+    return Frame(image=image, seq=next(_sequence), timestamp=started, received=time.monotonic())
+
+
+class CaptureService:
+    def __init__(self):
+        self.capture_time = 0.0
+        self._condition = threading.Condition()
+        self._channel = threading.Lock()
+        self._buffers: list[Optional[Frame]] = [None, None]
+        self._front = 0
+        self._last_input = 0.0
+        self._depth = 0
+        self._idle = False
+        self._requested = False
+        self._owner: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _stopped(self) -> bool:
+        return not self._depth or self._thread is not threading.current_thread()
+
+    def _run(self, context) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped() and not (self._idle and self._requested):
+                    self._condition.wait()
+                if self._stopped():
+                    return
+                self._requested = False
+
+            with self._channel:
+                with self._condition:
+                    if self._stopped() or not self._idle:
+                        continue
+                started = time.monotonic()
+                try:
+                    image = context.tasker.controller.post_screencap().wait().get()
+                except Exception:
+                    image = None
+
+                with self._condition:
+                    if image is not None:
+                        frame = next_frame(image, started)
+                        back = 1 - self._front
+                        self._buffers[back] = frame
+                        self._front = back
+                        self.capture_time += (frame.received - started - self.capture_time) * CAPTURE_TIME_SMOOTHING
+                    self._condition.notify_all()
+            if image is None:
+                time.sleep(CAPTURE_RETRY_INTERVAL)
+
+    def _ensure_running(self, context) -> None:
+        if self._thread is not None:
+            return
+
+        self._buffers = [None, None]
+        self._thread = threading.Thread(target=self._run, args=(context,), name="maanop-capture", daemon=True)
+        self._thread.start()
+
+    def _owns_channel(self) -> bool:
+        return self._depth > 0 and self._owner == threading.get_ident()
+
+    def _release(self) -> None:
+        self._idle = True
+        self._requested = True
+        self._channel.release()
+        self._condition.notify_all()
+
+    def _acquire(self) -> None:
+        with self._condition:
+            self._idle = False
+            self._requested = False
+        self._channel.acquire()
+
+    def begin(self) -> None:
+        with self._condition:
+            self._depth += 1
+            self._last_input = time.monotonic()
+            if self._depth > 1:
+                return
+            self._owner = threading.get_ident()
+        self._channel.acquire()
+
+    def end(self) -> None:
+        with self._condition:
+            self._depth = max(self._depth - 1, 0)
+            if self._depth:
+                return
+            thread = self._thread
+            self._thread = None
+            self._owner = None
+            self._idle = False
+            self._requested = False
+            self._channel.release()
+            self._condition.notify_all()
+
+        if thread is not None:
+            thread.join(CAPTURE_STOP_TIMEOUT)
+
+    def mark_input(self) -> None:
+        with self._condition:
+            self._last_input = time.monotonic()
+
+    def pause(self, seconds: float) -> None:
+        with self._condition:
+            prefetch = self._owns_channel() and self._thread is not None
+            lead = min(self.capture_time, seconds) if prefetch else 0.0
+
+        time.sleep(seconds - lead)
+        if not prefetch:
+            return
+
+        with self._condition:
+            self._release()
+        time.sleep(lead)
+        self._acquire()
+
+    def read(self, context, max_age: float, after_seq: int = 0, timeout: float = 0) -> Optional[Frame]:
+        with self._condition:
+            if not self._owns_channel():
+                return None
+
+            self._ensure_running(context)
+            deadline = time.monotonic() + timeout
+            frame = None
+            while True:
+                candidate = self._buffers[self._front]
+                if (
+                    candidate is not None
+                    and candidate.seq > after_seq
+                    and candidate.timestamp >= self._last_input
+                    and time.monotonic() - candidate.received <= max_age
+                ):
+                    frame = candidate
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    break
+                if self._idle:
+                    self._requested = True
+                    self._condition.notify_all()
+                else:
+                    self._release()
+                self._condition.wait(remaining)
+
+            released = self._idle
+        if released:
+            self._acquire()
+        return frame
+
+
+capture_service: Optional[CaptureService] = None
+
+
+def mark_input() -> None:
+    if capture_service:
+        capture_service.mark_input()
+
+
+def pause(seconds: float) -> None:
+    if capture_service:
+        capture_service.pause(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def _wrap(method):
+    def captured(context, argv):
+        capture_service.begin()
+        try:
+            return method(context, argv)
+        finally:
+            capture_service.end()
+
+    return captured
+
+
+def install() -> None:
+    global capture_service
+    if not capture_enabled():
+        return
+
+    capture_service = CaptureService()
+    for action in AgentServer._custom_action_holder.values():
+        action.run = _wrap(action.run)
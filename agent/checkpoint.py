@@ -0,0 +1,98 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from constants import CHECKPOINT_MAX_AGE, CHECKPOINT_PATH
+
+
+class RunCheckpoint:
+    def __init__(self, path: Path):
+        self.path = path
+        self._data: Optional[dict[str, Any]] = None
+
+    def _load(self) -> dict[str, Any]:
+        if self._data is not None:
+            return self._data
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+
+        self._data = data if isinstance(data, dict) else {}
+        return self._data
+
+    def _save(self) -> None:
+        data = self._load()
+        data["updated"] = round(time.time(), 3)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def resumable(
+        self,
+        task_mode: Optional[str],
+        server_list: list[int],
+        server_order: Optional[list[int]] = None,
+    ) -> Optional[dict[str, Any]]:
+        data = self._load()
+        updated = data.get("updated")
+        if not isinstance(updated, (int, float)) or not 0 <= time.time() - updated <= CHECKPOINT_MAX_AGE:
+            return None
+        if data.get("task_mode") != task_mode or data.get("server_list") != server_list:
+            return None
+        if data.get("server_order") != server_order:
+            return None
+        if not isinstance(data.get("server_index"), int) or data["server_index"] >= len(server_list):
+            return None
+        return dict(data)
+
+    def start(self, task_mode: Optional[str], server_list: list[int], server_order: Optional[list[int]] = None) -> None:
+        self._data = {"task_mode": task_mode, "server_list": server_list}
+        if server_order is not None:
+            self._data["server_order"] = server_order
+        self._save()
+
+    def record_server(self, server_index: int, server_id: int) -> None:
+        data = self._load()
+        if data.get("server_index") == server_index and data.get("server_id") == server_id:
+            return
+
+        data["server_index"] = server_index
+        data["server_id"] = server_id
+        data.pop("step", None)
+        self._save()
+
+    def record_step(self, step: str) -> None:
+        data = self._load()
+        if "server_id" not in data or data.get("step") == step:
+            return
+
+        data["step"] = step
+        self._save()
+
+    def last_step(self, server_id: Optional[int]) -> Optional[str]:
+        data = self._load()
+        if server_id is None or data.get("server_id") != server_id:
+            return None
+        return data.get("step")
+
+    def clear(self) -> None:
+        self._data = {}
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+run_checkpoint = RunCheckpoint(CHECKPOINT_PATH)
@@ -1,13 +1,46 @@
-from collections import Counter
+import hashlib
+import json
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
 from typing import Any, Optional
 
+import numpy
 from maa.context import Context
 
+import capture
+import notification
+import profiling
+import recording
+from constants import (
+    CAPTURE_MAX_AGE,
+    CAPTURE_READ_TIMEOUT,
+    FRAME_DIGEST_MEMO_SIZE,
+    INPUT_POLL_INTERVAL,
+    OCR_ROI_ASSIGN_PADDING,
+    RECOGNITION_CACHE_SIZE,
+    SCREEN_CHANGE_THRESHOLD,
+    SCREEN_POLL_INTERVAL,
+    SCREEN_SIGNATURE_STEP,
+    SERVER_1000_LIST_ROI,
+    SERVER_SNAPSHOT_MAX_DIFFERENCE,
+)
+
 
 def strip_quotes(value: Optional[str]) -> str:
     return (value or "").strip('"')
 
 
+def parse_json_param(param: Optional[str]) -> dict[str, Any]:
+    try:
+        value = json.loads(param) if param else {}
+    except ValueError:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
 def has_node_hit(context: Context, node_name: str) -> bool:
     return context.get_hit_count(node_name) > 0
 
@@ -31,22 +64,134 @@ def get_detail_value(context: Context, node_name: str, key: str, default: Any =
 
 
 def send_focus_message(context: Context, message: str) -> None:
-    context.run_action(
-        "LoginMsg",
-        pipeline_override={
-            "LoginMsg": {
-                "focus": {
-                    "Node.Action.Succeeded": message,
-                }
+    notification.send(context, message)
+
+
+_frame_digests: "OrderedDict[int, tuple[weakref.ref, bytes]]" = OrderedDict()
+
+
+def frame_digest(image) -> Optional[bytes]:
+    if image is None:
+        return None
+
+    frame_id = id(image)
+    memo = _frame_digests.get(frame_id)
+    if memo is not None and memo[0]() is image:
+        return memo[1]
+
+    frame = numpy.ascontiguousarray(image)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr((frame.shape, frame.dtype.str)).encode())
+    hasher.update(memoryview(frame).cast("B"))
+    digest = hasher.digest()
+
+    try:
+        _frame_digests[frame_id] = (weakref.ref(image), digest)
+    except TypeError:
+        return digest
+    _frame_digests.move_to_end(frame_id)
+    while len(_frame_digests) > FRAME_DIGEST_MEMO_SIZE:
+        _frame_digests.popitem(last=False)
+    return digest
+
+
+def _override_digest(override: Optional[dict[str, Any]]) -> str:
+    if not override:
+        return ""
+    return json.dumps(override, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class RecognitionCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            reco_detail = self._entries.get(key)
+            if reco_detail is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return reco_detail
+
+    def put(self, key, reco_detail) -> None:
+        if reco_detail is None or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = reco_detail
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
             }
-        },
-    )
 
 
-def run_recognition(context: Context, reco_name: str, image, override: Optional[dict[str, Any]] = None):
+recognition_cache = RecognitionCache(RECOGNITION_CACHE_SIZE)
+
+
+def run_recognition(
+    context: Context,
+    reco_name: str,
+    image,
+    override: Optional[dict[str, Any]] = None,
+    use_cache: bool = True,
+):
+    cache_key = None
+    if use_cache:
+        digest = frame_digest(image)
+        if digest is not None:
+            cache_key = (digest, reco_name, _override_digest(override))
+            reco_detail = recognition_cache.get(cache_key)
+            if reco_detail is not None:
+                profiling.count("cached_recognitions")
+                return reco_detail
+
+    profiling.count("recognitions")
     if override is None:
-        return context.run_recognition(reco_name, image)
-    return context.run_recognition(reco_name, image, override)
+        reco_detail = context.run_recognition(reco_name, image)
+    else:
+        reco_detail = context.run_recognition(reco_name, image, override)
+
+    if cache_key is not None:
+        recognition_cache.put(cache_key, reco_detail)
+    return reco_detail
+
+
+def is_hit(reco_detail) -> bool:
+    return bool(reco_detail and reco_detail.hit and reco_detail.best_result)
+
+
+def run_recognitions(context: Context, image, requests, first_hit: bool = False) -> list[Any]:
+    results = [None] * len(requests)
+    for index, request in enumerate(requests):
+        reco_name, override = (request, None) if isinstance(request, str) else request
+        results[index] = run_recognition(context, reco_name, image, override)
+        if first_hit and is_hit(results[index]):
+            break
+    return results
 
 
 def get_recognition_box(
@@ -61,29 +206,272 @@ def get_recognition_box(
     return reco_detail.best_result.box
 
 
+def union_roi(rois) -> list[int]:
+    left = min(roi[0] for roi in rois)
+    top = min(roi[1] for roi in rois)
+    right = max(roi[0] + roi[2] for roi in rois)
+    bottom = max(roi[1] + roi[3] for roi in rois)
+    return [left, top, right - left, bottom - top]
+
+
+def _box_center_in_roi(box, roi, padding: int) -> bool:
+    center_x = box[0] + box[2] / 2
+    center_y = box[1] + box[3] / 2
+    return (
+        roi[0] - padding <= center_x <= roi[0] + roi[2] + padding
+        and roi[1] - padding <= center_y <= roi[1] + roi[3] + padding
+    )
+
+
+def group_results_by_roi(results, rois, padding: int = OCR_ROI_ASSIGN_PADDING) -> list[list[Any]]:
+    grouped = [[] for _ in rois]
+    for result in results or []:
+        box = _get_ocr_box(result)
+        if box is None:
+            continue
+
+        for roi_index, roi in enumerate(rois):
+            if _box_center_in_roi(box, roi, padding):
+                grouped[roi_index].append(result)
+                break
+
+    for group in grouped:
+        group.sort(key=lambda item: _get_ocr_box(item)[0])
+    return grouped
+
+
+def read_roi_texts(context: Context, image, reco_name: str, rois) -> list[str]:
+    reco_detail = run_recognition(context, reco_name, image, {reco_name: {"roi": union_roi(rois)}})
+    grouped = group_results_by_roi(getattr(reco_detail, "all_results", None) if reco_detail else None, rois)
+    return ["".join(getattr(result, "text", "") or "" for result in group) for group in grouped]
+
+
+def pause(seconds: float) -> None:
+    capture.pause(seconds)
+
+
+def capture_frame(context: Context, max_age: float = CAPTURE_MAX_AGE, after_seq: int = 0) -> capture.Frame:
+    frame = None
+    if capture.capture_service:
+        frame = capture.capture_service.read(context, max_age, after_seq, CAPTURE_READ_TIMEOUT)
+    if frame is None:
+        profiling.count("screencaps")
+        started = time.monotonic()
+        frame = capture.next_frame(context.tasker.controller.post_screencap().wait().get(), started)
+    recording.record_frame(frame.image, "capture")
+    return frame
+
+
 def capture_image(context: Context):
-    return context.tasker.controller.post_screencap().wait().get()
+    return capture_frame(context).image
+
+
+def frame_signature(image):
+    small = numpy.asarray(image)[::SCREEN_SIGNATURE_STEP, ::SCREEN_SIGNATURE_STEP]
+    if small.ndim == 3:
+        small = small.mean(axis=2)
+    return small.astype(numpy.float32)
+
+
+def frame_difference(signature, other_signature) -> float:
+    if signature.shape != other_signature.shape:
+        return float("inf")
+    return float(numpy.abs(signature - other_signature).mean())
+
+
+def wait_for_screen_change(context: Context, reference, timeout: float):
+    reference_signature = frame_signature(reference)
+    deadline = time.monotonic() + timeout
+    last_signature = None
+    changed = False
+    seq = 0
+
+    while True:
+        frame = capture_frame(context, after_seq=seq)
+        image, seq = frame.image, frame.seq
+        signature = frame_signature(image)
+        if not changed:
+            changed = frame_difference(signature, reference_signature) > SCREEN_CHANGE_THRESHOLD
+        elif frame_difference(signature, last_signature) <= SCREEN_CHANGE_THRESHOLD:
+            return image, True
+
+        last_signature = signature
+        if time.monotonic() >= deadline:
+            return image, changed
+        pause(SCREEN_POLL_INTERVAL)
+
+
+def wait_for_screen_stable(context: Context, max_wait: float):
+    start = time.monotonic()
+    deadline = start + max_wait
+    last_signature = None
+    seq = 0
+
+    while True:
+        frame = capture_frame(context, after_seq=seq)
+        image, seq = frame.image, frame.seq
+        signature = frame_signature(image)
+        if last_signature is not None and frame_difference(signature, last_signature) <= SCREEN_CHANGE_THRESHOLD:
+            return image, time.monotonic() - start
+
+        last_signature = signature
+        if time.monotonic() >= deadline:
+            return image, time.monotonic() - start
+        pause(SCREEN_POLL_INTERVAL)
+
+
+def get_node_next_names(node_data: Optional[dict[str, Any]]) -> list[str]:
+    names = []
+    for item in (node_data or {}).get("next", []) or []:
+        name = item.get("name") if isinstance(item, dict) else item
+        if isinstance(name, str):
+            names.append(name)
+    return names
+
+
+def format_next_item(item) -> Optional[str]:
+    if not isinstance(item, dict):
+        return item if isinstance(item, str) else None
+    name = item.get("name")
+    if not isinstance(name, str):
+        return None
+    if item.get("jump_back"):
+        return f"[JumpBack]{name}"
+    if item.get("anchor"):
+        return f"[Anchor]{name}"
+    return name
+
+
+def get_node_attach(context: Context, node_name: str) -> dict[str, Any]:
+    node_data = context.get_node_data(node_name) or {}
+    attach = node_data.get("attach")
+    return attach if isinstance(attach, dict) else {}
+
+
+def collect_node_chain(
+    context: Context,
+    start_node: str,
+    prefix: str,
+    exit_nodes: tuple[str, ...] = (),
+) -> dict[str, dict[str, Any]]:
+    nodes = {}
+    visited = {start_node}
+    pending = deque([start_node])
+
+    while pending:
+        node_name = pending.popleft()
+        node_data = context.get_node_data(node_name)
+        if node_data is None:
+            continue
+
+        if node_name.startswith(prefix):
+            nodes[node_name] = node_data
+        for item in node_data.get("next", []) or []:
+            if not isinstance(item, dict) or item.get("jump_back"):
+                continue
+            next_name = item.get("name")
+            if next_name and next_name not in visited and next_name not in exit_nodes:
+                visited.add(next_name)
+                pending.append(next_name)
+
+    return nodes
+
+
+def get_node_custom_action(node_data: Optional[dict[str, Any]]) -> Optional[str]:
+    action = (node_data or {}).get("action")
+    if not isinstance(action, dict) or action.get("type") != "Custom":
+        return None
+    return (action.get("param") or {}).get("custom_action")
 
 
 def click_point(context: Context, x: int, y: int) -> bool:
+    profiling.count("inputs")
+    recording.record_input("click", x=int(x), y=int(y))
     context.tasker.controller.post_click(x, y).wait()
+    capture.mark_input()
     return True
 
 
 def click_key(context: Context, key: int) -> bool:
+    profiling.count("inputs")
+    recording.record_input("key", key=int(key))
     context.tasker.controller.post_click_key(key).wait()
+    capture.mark_input()
     return True
 
 
+def input_text(context: Context, text: str) -> bool:
+    profiling.count("inputs")
+    recording.record_input("text", text=text)
+    context.tasker.controller.post_input_text(text).wait()
+    capture.mark_input()
+    return True
+
+
+def box_center(box) -> tuple[int, int]:
+    return box[0] + box[2] // 2, box[1] + box[3] // 2
+
+
 def click_box_center(context: Context, box) -> bool:
     if not box:
         return False
 
-    center_x = box[0] + box[2] // 2
-    center_y = box[1] + box[3] // 2
+    center_x, center_y = box_center(box)
     return click_point(context, center_x, center_y)
 
 
+@dataclass
+class InputBatch:
+    succeeded: bool
+    latencies: list[float]
+
+
+def _post_input(controller, step):
+    kind, *values = step
+    if kind == "click":
+        x, y = int(values[0]), int(values[1])
+        recording.record_input("click", x=x, y=y)
+        return controller.post_click(x, y)
+    if kind == "key":
+        recording.record_input("key", key=int(values[0]))
+        return controller.post_click_key(int(values[0]))
+    raise ValueError(f"Unknown input step: {step}")
+
+
+def _poll_input_jobs(posted, done_at, deadline: float) -> None:
+    while True:
+        now = time.monotonic()
+        for index, (job, _) in enumerate(posted):
+            if done_at[index] is None and job.done:
+                done_at[index] = now
+        if now >= deadline:
+            return
+        time.sleep(min(INPUT_POLL_INTERVAL, deadline - now))
+
+
+def post_inputs(context: Context, steps, spacing: float = 0.0) -> InputBatch:
+    controller = context.tasker.controller
+    posted = []
+    done_at = []
+    for step in steps:
+        if posted and spacing > 0:
+            _poll_input_jobs(posted, done_at, posted[-1][1] + spacing)
+        posted.append((_post_input(controller, step), time.monotonic()))
+        done_at.append(None)
+
+    if not posted:
+        return InputBatch(succeeded=True, latencies=[])
+
+    profiling.count("inputs", len(posted))
+    posted[-1][0].wait()
+    capture.mark_input()
+    now = time.monotonic()
+    return InputBatch(
+        succeeded=all(job.succeeded for job, _ in posted),
+        latencies=[((done or now) - post_time) * 1000 for (_, post_time), done in zip(posted, done_at)],
+    )
+
+
 def parse_digits(text: Optional[str]) -> str:
     return "".join(ch for ch in (text or "") if ch.isdigit())
 
@@ -93,6 +481,7 @@ SERVER_NUMBER_CHARS = set("0123456789|")
 SERVER_GRID_ROW_TOLERANCE = 9
 SERVER_GRID_COL_TOLERANCE = 45
 SERVER_GRID_MIN_BASE_VOTES = 3
+SERVER_SCROLL_ROW_MARGIN = 1
 
 
 def _extract_number_like_tokens(text: str) -> list[str]:
@@ -133,19 +522,20 @@ def _get_ocr_box(result):
 
 def _cluster_entries(entries: list[dict[str, Any]], coord_key: str, tolerance: int) -> dict[int, int]:
     clusters = []
+    cluster = None
 
     for entry in sorted(entries, key=lambda item: item[coord_key]):
         coord = entry[coord_key]
-        for cluster in clusters:
-            if abs(coord - cluster["coord"]) <= tolerance:
-                cluster["members"].append(entry)
-                cluster["coord"] = sum(item[coord_key] for item in cluster["members"]) / len(cluster["members"])
-                break
+        if cluster is not None and coord - cluster["coord"] <= tolerance:
+            cluster["members"].append(entry)
+            cluster["total"] += coord
+            cluster["coord"] = cluster["total"] / len(cluster["members"])
         else:
-            clusters.append({"coord": coord, "members": [entry]})
+            cluster = {"coord": coord, "total": coord, "members": [entry]}
+            clusters.append(cluster)
 
     entry_to_cluster = {}
-    for cluster_index, cluster in enumerate(sorted(clusters, key=lambda item: item["coord"])):
+    for cluster_index, cluster in enumerate(clusters):
         for entry in cluster["members"]:
             entry_to_cluster[entry["index"]] = cluster_index
 
@@ -187,6 +577,8 @@ def _build_server_ocr_entries(results) -> list[dict[str, Any]]:
     for entry in entries:
         row = row_by_index[entry["index"]]
         col = col_by_index[entry["index"]]
+        entry["row"] = row
+        entry["col"] = col
         entry["grid_index"] = row * col_count + col
 
     return entries
@@ -204,7 +596,7 @@ def _entry_anchor_number(entry: dict[str, Any]) -> Optional[int]:
     return number if number > 0 else None
 
 
-def _infer_server_grid_base(entries: list[dict[str, Any]]) -> Optional[int]:
+def _count_base_votes(entries: list[dict[str, Any]]) -> Counter:
     base_votes = Counter()
     for entry in entries:
         number = _entry_anchor_number(entry)
@@ -212,7 +604,11 @@ def _infer_server_grid_base(entries: list[dict[str, Any]]) -> Optional[int]:
             continue
 
         base_votes[number + entry["grid_index"]] += 1
+    return base_votes
 
+
+def _infer_server_grid_base(entries: list[dict[str, Any]]) -> Optional[int]:
+    base_votes = _count_base_votes(entries)
     if not base_votes:
         return None
 
@@ -224,26 +620,95 @@ def _infer_server_grid_base(entries: list[dict[str, Any]]) -> Optional[int]:
     return best_base
 
 
-def _find_server_by_layout(reco_detail, target_server_id: int):
+def infer_server_grid(reco_detail) -> Optional[dict[str, int]]:
     entries = _build_server_ocr_entries(getattr(reco_detail, "all_results", []) if reco_detail else [])
     grid_base = _infer_server_grid_base(entries)
     if grid_base is None:
         return None
 
+    return {
+        "base": grid_base,
+        "col_count": max(entry["col"] for entry in entries) + 1,
+        "row_count": max(entry["row"] for entry in entries) + 1,
+    }
+
+
+def plan_server_scroll_rows(grid: dict[str, int], target_server_id: int) -> Optional[int]:
+    target_index = grid["base"] - target_server_id
+    if target_index < 0:
+        return None
+
+    target_row = target_index // grid["col_count"]
+    last_full_row = grid["row_count"] - 1 - SERVER_SCROLL_ROW_MARGIN
+    return max(target_row - last_full_row, 0)
+
+
+def _find_server_by_layout(reco_detail, target_server_id: int, fallback_base: Optional[int] = None):
+    entries = _build_server_ocr_entries(getattr(reco_detail, "all_results", []) if reco_detail else [])
+    grid_base = _infer_server_grid_base(entries)
+    match_mode = "layout_inferred"
+    if grid_base is None and fallback_base is not None:
+        base_votes = _count_base_votes(entries)
+        if base_votes[fallback_base] and base_votes[fallback_base] == max(base_votes.values()):
+            grid_base = fallback_base
+            match_mode = "index_inferred"
+    if grid_base is None:
+        return None, None
+
     for entry in entries:
         entry["corrected_server_id"] = grid_base - entry["grid_index"]
         if entry["corrected_server_id"] == target_server_id:
-            return entry["result"]
+            return entry["result"], match_mode
+
+    return None, None
 
-    return None
 
+def _server_list_signature(image):
+    x, y, width, height = SERVER_1000_LIST_ROI
+    crop = numpy.asarray(image)[y : y + height, x : x + width]
+    return (crop.mean(axis=2) if crop.ndim == 3 else crop).astype(numpy.float32)
 
-def find_server_ocr_result(reco_detail, target_server_id: int):
+
+@dataclass(frozen=True)
+class ServerListSnapshot:
+    server_id: int
+    frame_seq: int
+    signature: Any
+    entries: list[dict[str, Any]]
+    grid_base: Optional[int]
+    box: tuple[int, int, int, int]
+    text: Optional[str]
+    match_mode: Optional[str]
+
+    def matches(self, server_id: int, image) -> bool:
+        return (
+            server_id == self.server_id
+            and frame_difference(_server_list_signature(image), self.signature) <= SERVER_SNAPSHOT_MAX_DIFFERENCE
+        )
+
+
+def snapshot_server_list(
+    frame: capture.Frame,
+    reco_detail,
+    server_id: int,
+    result,
+    match_mode: Optional[str],
+) -> ServerListSnapshot:
+    entries = _build_server_ocr_entries(getattr(reco_detail, "all_results", []) if reco_detail else [])
+    return ServerListSnapshot(
+        server_id=server_id,
+        frame_seq=frame.seq,
+        signature=_server_list_signature(frame.image),
+        entries=entries,
+        grid_base=_infer_server_grid_base(entries),
+        box=tuple(_get_ocr_box(result)),
+        text=getattr(result, "text", None),
+        match_mode=match_mode,
+    )
+
+
+def find_server_ocr_result(reco_detail, target_server_id: int, fallback_base: Optional[int] = None):
     if reco_detail and reco_detail.hit and reco_detail.best_result:
         return reco_detail.best_result, "exact"
 
-    layout_result = _find_server_by_layout(reco_detail, target_server_id)
-    if layout_result:
-        return layout_result, "layout_inferred"
-
-    return None, None
+    return _find_server_by_layout(reco_detail, target_server_id, fallback_base)
@@ -1,3 +1,9 @@
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = PROJECT_DIR / "cache"
+DEBUG_DIR = PROJECT_DIR / "debug"
+
 SHOPPING_TOTAL = 1500
 
 SHOPPING_SLOT_ROIS = [
@@ -18,6 +24,16 @@ SHOPPING_GIFT_COUNT_ROIS = [
     [900, 516, 12, 14],
 ]
 
+SHOPPING_GIFT_CHARS = ("木", "叶", "购", "物", "狂", "欢")
+SHOPPING_GIFT_COUNT_DIGITS = "123"
+
+SHOPPING_GIFT_CONTROL_TEMPLATES = {
+    "select": "ShoppingFestivalGiftSelectTemplate",
+    "minus": "ShoppingFestivalMinusTemplate",
+    "plus": "ShoppingFestivalPlusTemplate",
+    "send": "ShoppingFestivalSendTemplate",
+}
+
 SHOPPING_GIFT_OPTION_CENTERS = [
     [654, 564, 14, 13],
     [654, 581, 13, 12],
@@ -35,3 +51,77 @@ SERVER_1000_SCROLL_CLICKS_PER_ATTEMPT = 3
 SERVER_1_999_SEARCH_ATTEMPTS = 30
 SERVER_1_999_SCROLL_CLICKS_PER_ATTEMPT = 8
 SERVER_SCROLL_CLICK_INTERVAL = 0.2
+SERVER_SCROLL_PROBE_CLICKS = 2
+
+SERVER_INDEX_PATH = CACHE_DIR / "server_list_index.json"
+SERVER_INDEX_DRIFT_CONFIRMATIONS = 2
+SERVER_SNAPSHOT_MAX_DIFFERENCE = 1.0
+
+RECOGNITION_CACHE_SIZE = 64
+FRAME_DIGEST_MEMO_SIZE = 8
+OCR_ROI_ASSIGN_PADDING = 4
+OCR_ROW_CACHE_SIZE = 256
+OCR_ROW_ACTIVITY = 6.0
+OCR_ROW_MIN_GAP = 3
+OCR_ROW_PADDING = 2
+
+SCREEN_SIGNATURE_STEP = 8
+SCREEN_CHANGE_THRESHOLD = 2.0
+SCREEN_POLL_INTERVAL = 0.03
+SCREEN_SETTLE_TIMEOUT = 0.2
+ESC_CHANGE_TIMEOUT = 0.5
+
+CAPTURE_MAX_AGE = 0.1
+CAPTURE_READ_TIMEOUT = 2.0
+CAPTURE_STOP_TIMEOUT = 2.0
+CAPTURE_RETRY_INTERVAL = 0.05
+CAPTURE_TIME_SMOOTHING = 0.3
+
+INPUT_POLL_INTERVAL = 0.005
+
+NOTIFY_QUEUE_SIZE = 16
+
+ADAPTIVE_DELAY_START_NODE = "LVstep001"
+ADAPTIVE_DELAY_NODE_PREFIX = "LVstep"
+ADAPTIVE_DELAY_DEFAULT_MAX = 200
+
+STALL_WATCHDOG_NODE = "StallWatchdog"
+STALL_DEFAULT_SECONDS = 30
+STALL_CHECK_GAP = 5.0
+STALL_MAX_RECOVERIES = 3
+
+PROFILE_LOG_PATH = DEBUG_DIR / "agent_profile.jsonl"
+PROFILE_MAX_BYTES = 4 * 1024 * 1024
+PROFILE_BACKUP_COUNT = 3
+
+RECORD_DIR = DEBUG_DIR / "sessions"
+RECORD_FRAME_DIR = "frames"
+RECORD_EVENTS_FILE = "events.jsonl"
+
+CHECKPOINT_PATH = CACHE_DIR / "run_checkpoint.json"
+CHECKPOINT_MAX_AGE = 6 * 60 * 60
+LEVELING_STEP_PREFIX = "LVstep"
+LEVELING_RESUME_NODE = "Leveling"
+LEVELING_START_STEP = "LVstep001"
+LEVELING_EXIT_NODE = "Login"
+LEVELING_STEP_JUMP_NODE = "LevelingStepJump"
+LEVELING_QUEST_TEMPLATE_PATTERN = r"^(task_\d+|task_complete_\d+|enermy_\d+)\.png$"
+LEVELING_STEP_SCORE_MARGIN = 0.05
+
+TEMPLATE_IMAGE_DIRS = (
+    PROJECT_DIR / "resource" / "image",
+    PROJECT_DIR / "assets" / "resource" / "image",
+)
+TEMPLATE_DEFAULT_THRESHOLD = 0.7
+TEMPLATE_FRAME_MEMO_SIZE = 4
+
+DIGIT_GLYPH_PATH = CACHE_DIR / "digit_glyphs.npz"
+DIGIT_GLYPH_IMAGE_DIR = "digits"
+DIGIT_GLYPH_SIZE = (10, 7)
+DIGIT_GLYPH_ALPHABET = "0123456789"
+DIGIT_GLYPH_MIN_CONTRAST = 40
+DIGIT_GLYPH_MIN_PIXELS = 3
+DIGIT_GLYPH_THRESHOLD = 0.94
+DIGIT_GLYPH_MARGIN = 0.05
+DIGIT_GLYPH_DUPLICATE_SCORE = 0.97
+DIGIT_GLYPH_MAX_PER_DIGIT = 8
@@ -0,0 +1,211 @@
+import os
+import threading
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy
+from maa.context import Context
+
+from common import is_hit, parse_digits, run_recognition
+from constants import (
+    DIGIT_GLYPH_ALPHABET,
+    DIGIT_GLYPH_DUPLICATE_SCORE,
+    DIGIT_GLYPH_IMAGE_DIR,
+    DIGIT_GLYPH_MARGIN,
+    DIGIT_GLYPH_MAX_PER_DIGIT,
+    DIGIT_GLYPH_MIN_CONTRAST,
+    DIGIT_GLYPH_MIN_PIXELS,
+    DIGIT_GLYPH_PATH,
+    DIGIT_GLYPH_SIZE,
+    DIGIT_GLYPH_THRESHOLD,
+)
+from template_match import load_template, resolve_templates, to_gray
+
+
+@dataclass(frozen=True)
+class DigitRead:
+    text: str
+    value: int
+    confidence: float
+
+
+def _normalize(gray):
+    low, high = numpy.percentile(gray, (10, 90))
+    if high - low < DIGIT_GLYPH_MIN_CONTRAST:
+        return None
+
+    scaled = numpy.clip((gray - low) / (high - low), 0.0, 1.0)
+    if (scaled > 0.5).mean() > 0.5:
+        scaled = 1.0 - scaled
+    return scaled
+
+
+def _resample(glyph):
+    height, width = DIGIT_GLYPH_SIZE
+    rows = ((numpy.arange(height) + 0.5) * glyph.shape[0] / height).astype(int)
+    cols = ((numpy.arange(width) + 0.5) * glyph.shape[1] / width).astype(int)
+    vector = glyph[rows][:, cols].ravel()
+    vector = vector - vector.mean()
+    norm = numpy.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+def split_glyphs(gray) -> list:
+    scaled = _normalize(gray)
+    if scaled is None:
+        return []
+
+    mask = scaled > 0.5
+    columns = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], mask.any(axis=0).astype(int), [0]))))
+    glyphs = []
+    for start, end in zip(columns[0::2], columns[1::2]):
+        run = mask[:, start:end]
+        if run.sum() < DIGIT_GLYPH_MIN_PIXELS:
+            continue
+        rows = numpy.flatnonzero(run.any(axis=1))
+        vector = _resample(scaled[rows[0] : rows[-1] + 1, start:end])
+        if vector is not None:
+            glyphs.append(vector)
+    return glyphs
+
+
+class DigitGlyphBank:
+    def __init__(self, path: Path):
+        self.path = path
+        self._glyphs: Optional[dict[str, dict[str, list]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, dict[str, list]]:
+        if self._glyphs is not None:
+            return self._glyphs
+
+        glyphs: dict[str, dict[str, list]] = {}
+        for name in resolve_templates([f"{DIGIT_GLYPH_IMAGE_DIR}/*/*.png"]):
+            _, kind, file_name = name.split("/")
+            vectors = split_glyphs(load_template(name))
+            if file_name[0].isdigit() and len(vectors) == 1:
+                glyphs.setdefault(kind, {}).setdefault(file_name[0], []).extend(vectors)
+
+        try:
+            with numpy.load(self.path) as data:
+                for key in data.files:
+                    kind, digit = key.split("/")
+                    glyphs.setdefault(kind, {}).setdefault(digit, []).extend(data[key])
+        except (OSError, ValueError, zipfile.BadZipFile):
+            pass
+
+        self._glyphs = glyphs
+        return self._glyphs
+
+    def _save(self) -> None:
+        arrays = {
+            f"{kind}/{digit}": numpy.stack(vectors)
+            for kind, digits in self._load().items()
+            for digit, vectors in digits.items()
+            if vectors
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_name(self.path.stem + ".tmp.npz")
+            numpy.savez_compressed(temp_path, **arrays)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def _scores(self, kind: str, vector) -> dict[str, float]:
+        return {
+            digit: float(max(numpy.dot(vectors, vector)))
+            for digit, vectors in self._load().get(kind, {}).items()
+            if vectors
+        }
+
+    def classify(self, gray, kind: str, alphabet: str = DIGIT_GLYPH_ALPHABET) -> Optional[DigitRead]:
+        glyphs = split_glyphs(gray)
+        if not glyphs:
+            return None
+
+        text = ""
+        confidence = 1.0
+        with self._lock:
+            for vector in glyphs:
+                scores = sorted(self._scores(kind, vector).items(), key=lambda item: item[1], reverse=True)
+                if not scores or scores[0][0] not in alphabet:
+                    return None
+                digit, score = scores[0]
+                runner_up = scores[1][1] if len(scores) > 1 else -1.0
+                text += digit
+                confidence = min(confidence, score if score - runner_up >= DIGIT_GLYPH_MARGIN else 0.0)
+        return DigitRead(text=text, value=int(text), confidence=confidence)
+
+    def learn(self, gray, kind: str, text: str) -> bool:
+        text = text.strip()
+        glyphs = split_glyphs(gray)
+        if not text.isdigit() or len(glyphs) != len(text):
+            return False
+
+        with self._lock:
+            digits = self._load().setdefault(kind, {})
+            learned = False
+            for digit, vector in zip(text, glyphs):
+                if self._scores(kind, vector).get(digit, -1.0) >= DIGIT_GLYPH_DUPLICATE_SCORE:
+                    continue
+                vectors = digits.setdefault(digit, [])
+                vectors.append(vector)
+                del vectors[:-DIGIT_GLYPH_MAX_PER_DIGIT]
+                learned = True
+            if learned:
+                self._save()
+        return learned
+
+
+digit_glyph_bank = DigitGlyphBank(DIGIT_GLYPH_PATH)
+
+
+def crop_gray(image, roi: Sequence[int]):
+    x, y, width, height = roi
+    return to_gray(numpy.asarray(image)[y : y + height, x : x + width])
+
+
+def classify_digits(
+    image,
+    roi: Sequence[int],
+    kind: str,
+    alphabet: str = DIGIT_GLYPH_ALPHABET,
+) -> Optional[DigitRead]:
+    read = digit_glyph_bank.classify(crop_gray(image, roi), kind, alphabet)
+    return read if read and read.confidence >= DIGIT_GLYPH_THRESHOLD else None
+
+
+def learn_digits(image, roi: Sequence[int], kind: str, text: str) -> bool:
+    return digit_glyph_bank.learn(crop_gray(image, roi), kind, text)
+
+
+def read_digits(
+    context: Context,
+    image,
+    roi: Sequence[int],
+    kind: str,
+    ocr_name: str,
+    alphabet: str = DIGIT_GLYPH_ALPHABET,
+) -> Optional[dict]:
+    read = classify_digits(image, roi, kind, alphabet)
+    if read:
+        return {"text": read.text, "value": read.value, "confidence": round(read.confidence, 4), "source": "glyph"}
+
+    reco_detail = run_recognition(context, ocr_name, image, {ocr_name: {"roi": list(roi)}})
+    if not is_hit(reco_detail):
+        return None
+
+    text = reco_detail.best_result.text or ""
+    digits = parse_digits(text)
+    if not digits:
+        return None
+
+    return {
+        "text": digits,
+        "value": int(digits),
+        "confidence": round(float(getattr(reco_detail.best_result, "score", 0.0)), 4),
+        "source": "ocr",
+    }
@@ -7,9 +7,14 @@ import action_common
 import action_login
 import action_shopping
 import action_training
+import capture
+import notification
+import profiling
+import reco_common
 import reco_login
 import reco_shopping
 import reco_training
+import recording
 
 
 def main():
@@ -21,6 +26,10 @@ def main():
         sys.exit(1)
         
     socket_id = sys.argv[-1]
+    recording.install()
+    capture.install()
+    notification.install()
+    profiling.install()
 
     AgentServer.start_up(socket_id)
     AgentServer.join()
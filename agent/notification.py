@@ -0,0 +1,96 @@
+import threading
+from collections import deque
+from typing import Optional
+
+from maa.agent.agent_server import AgentServer
+from maa.context import Context
+
+from constants import NOTIFY_QUEUE_SIZE
+
+_state = threading.local()
+
+
+def post_focus_message(context: Context, message: str) -> None:
+    context.run_action(
+        "LoginMsg",
+        pipeline_override={
+            "LoginMsg": {
+                "focus": {
+                    "Node.Action.Succeeded": message,
+                }
+            }
+        },
+    )
+
+
+class NotificationQueue:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.dropped = 0
+        self.merged = 0
+        self._unreported = 0
+        self._messages: deque[list] = deque()
+        self._lock = threading.Lock()
+
+    def put(self, message: str) -> None:
+        with self._lock:
+            if self._messages and self._messages[-1][0] == message:
+                self._messages[-1][1] += 1
+                self.merged += 1
+                return
+
+            if len(self._messages) >= self.max_size:
+                self._messages.popleft()
+                self.dropped += 1
+                self._unreported += 1
+            self._messages.append([message, 1])
+
+    def drain(self) -> Optional[str]:
+        with self._lock:
+            if not self._messages:
+                return None
+
+            lines = [message if repeat == 1 else f"{message} (x{repeat})" for message, repeat in self._messages]
+            self._messages.clear()
+            dropped, self._unreported = self._unreported, 0
+        if dropped:
+            lines.insert(0, f"(省略 {dropped} 条消息)")
+        return "\n".join(lines)
+
+
+notification_queue: Optional[NotificationQueue] = None
+
+
+def send(context: Context, message: str) -> None:
+    if notification_queue is None or not getattr(_state, "depth", 0):
+        post_focus_message(context, message)
+        return
+    notification_queue.put(message)
+
+
+def flush(context: Context) -> None:
+    message = notification_queue.drain() if notification_queue else None
+    if message:
+        post_focus_message(context, message)
+
+
+def _wrap(method):
+    def notified(context, argv):
+        _state.depth = getattr(_state, "depth", 0) + 1
+        try:
+            return method(context, argv)
+        finally:
+            _state.depth -= 1
+            if not _state.depth:
+                flush(context)
+
+    return notified
+
+
+def install() -> None:
+    global notification_queue
+    notification_queue = NotificationQueue(NOTIFY_QUEUE_SIZE)
+    for recognition in AgentServer._custom_recognition_holder.values():
+        recognition.analyze = _wrap(recognition.analyze)
+    for action in AgentServer._custom_action_holder.values():
+        action.run = _wrap(action.run)
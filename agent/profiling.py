@@ -0,0 +1,195 @@
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Optional
+
+from maa.agent.agent_server import AgentServer
+
+from constants import PROFILE_BACKUP_COUNT, PROFILE_LOG_PATH, PROFILE_MAX_BYTES
+
+COUNTER_NAMES = (
+    "recognitions",
+    "cached_recognitions",
+    "screencaps",
+    "inputs",
+    "ocr_rows",
+    "cached_ocr_rows",
+    "saved_delay_ms",
+)
+
+_state = threading.local()
+_logger: Optional[logging.Logger] = None
+current_server: Optional[int] = None
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get("MAANOP_PROFILE", "1") != "0"
+
+
+def count(counter: str, amount: int = 1) -> None:
+    for frame in getattr(_state, "stack", ()):
+        frame[counter] += amount
+
+
+def _get_logger() -> Optional[logging.Logger]:
+    global _logger
+    if _logger is not None:
+        return _logger
+
+    logger = logging.getLogger("maanop.profile")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    try:
+        PROFILE_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            PROFILE_LOG_PATH,
+            maxBytes=PROFILE_MAX_BYTES,
+            backupCount=PROFILE_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+    except OSError:
+        logger.disabled = True
+    else:
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+
+    _logger = logger
+    return _logger
+
+
+def _update_current_server(result) -> None:
+    global current_server
+    detail = getattr(result, "detail", None)
+    if isinstance(detail, dict) and isinstance(detail.get("server_id"), int):
+        current_server = detail["server_id"]
+
+
+def _wrap(kind: str, name: str, method):
+    def profiled(context, argv):
+        stack = getattr(_state, "stack", None)
+        if stack is None:
+            stack = _state.stack = []
+
+        frame = dict.fromkeys(COUNTER_NAMES, 0)
+        stack.append(frame)
+        error = None
+        result = None
+        start = time.perf_counter()
+        try:
+            result = method(context, argv)
+            return result
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stack.pop()
+            if kind == "recognition":
+                _update_current_server(result)
+                success = getattr(result, "box", None) is not None
+            else:
+                success = bool(result)
+
+            record = {
+                "ts": round(time.time(), 3),
+                "kind": kind,
+                "name": name,
+                "node": getattr(argv, "node_name", None),
+                "server": current_server,
+                "ms": round(elapsed_ms, 3),
+                "success": success,
+                **frame,
+            }
+            if error:
+                record["error"] = error
+
+            logger = _get_logger()
+            if logger:
+                logger.info(json.dumps(record, ensure_ascii=False))
+
+    return profiled
+
+
+def install() -> None:
+    if not profiling_enabled():
+        return
+
+    for name, recognition in AgentServer._custom_recognition_holder.items():
+        recognition.analyze = _wrap("recognition", name, recognition.analyze)
+    for name, action in AgentServer._custom_action_holder.items():
+        action.run = _wrap("action", name, action.run)
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def load_records(path: Path) -> list[dict[str, Any]]:
+    paths = [Path(f"{path}.{index}") for index in range(PROFILE_BACKUP_COUNT, 0, -1)] + [path]
+    records = []
+    for log_path in paths:
+        if not log_path.exists():
+            continue
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def _print_table(title: str, groups: dict[Any, list[dict[str, Any]]]) -> None:
+    print(title)
+    print(
+        f"{'':<44} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'reco':>6} {'cap':>6} {'input':>6} "
+        f"{'row hit':>8} {'saved s':>8}"
+    )
+    for key, records in sorted(groups.items(), key=lambda item: str(item[0])):
+        times = [record["ms"] for record in records]
+        totals = [sum(record.get(counter, 0) for record in records) for counter in COUNTER_NAMES]
+        averages = [total / len(records) for total in totals]
+        row_hit = f"{totals[5] / totals[4]:.0%}" if totals[4] else "-"
+        print(
+            f"{str(key):<44} {len(records):>6} {_percentile(times, 50):>9.1f} {_percentile(times, 95):>9.1f} "
+            f"{_percentile(times, 99):>9.1f} {averages[0]:>6.1f} {averages[2]:>6.1f} {averages[3]:>6.1f} "
+            f"{row_hit:>8} {totals[6] / 1000:>8.1f}"
+        )
+    print()
+
+
+def report(path: Path) -> None:
+    records = load_records(path)
+    if not records:
+        print(f"No profile records found in {path}")
+        return
+
+    by_node = defaultdict(list)
+    by_server = defaultdict(list)
+    for record in records:
+        suffix = f"@{record['node']}" if record.get("node") else ""
+        by_node[f"{record['kind']}:{record['name']}{suffix}"].append(record)
+        by_server[record.get("server")].append(record)
+
+    _print_table("Per node (ms)", by_node)
+    _print_table("Per server (ms)", by_server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize agent profile logs.")
+    parser.add_argument("path", nargs="?", type=Path, default=PROFILE_LOG_PATH)
+    args = parser.parse_args()
+    report(args.path)
+
+
+if __name__ == "__main__":
+    main()
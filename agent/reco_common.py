@@ -0,0 +1,79 @@
+from maa.agent.agent_server import AgentServer
+from maa.custom_recognition import CustomRecognition
+from maa.context import Context
+
+from common import parse_json_param
+from constants import DIGIT_GLYPH_ALPHABET, TEMPLATE_DEFAULT_THRESHOLD
+from digit_glyph import read_digits
+from template_match import get_template_bank, resolve_templates
+
+
+def _get_template_patterns(param: dict) -> list[str]:
+    templates = param.get("templates") or param.get("template") or []
+    return [templates] if isinstance(templates, str) else list(templates)
+
+
+def _get_thresholds(param: dict, count: int) -> list[float]:
+    thresholds = param.get("threshold", TEMPLATE_DEFAULT_THRESHOLD)
+    if not isinstance(thresholds, list):
+        return [thresholds] * count
+    if not thresholds:
+        return [TEMPLATE_DEFAULT_THRESHOLD] * count
+    return [thresholds[min(index, len(thresholds) - 1)] for index in range(count)]
+
+
+@AgentServer.custom_recognition("TemplateBankMatch")
+class TemplateBankMatch(CustomRecognition):
+    def analyze(
+        self,
+        context: Context,
+        argv: CustomRecognition.AnalyzeArg,
+    ) -> CustomRecognition.AnalyzeResult:
+        param = parse_json_param(argv.custom_recognition_param)
+        names = resolve_templates(_get_template_patterns(param))
+        if not names:
+            return CustomRecognition.AnalyzeResult(box=None, detail={"error": "No templates found"})
+
+        result = get_template_bank(names).match(
+            argv.image,
+            list(argv.roi) if argv.roi else None,
+            min(_get_thresholds(param, len(names))),
+        )
+        hit = result["hit"]
+        best = result["best"]
+
+        return CustomRecognition.AnalyzeResult(
+            box=tuple(hit["box"]) if hit else None,
+            detail={
+                "template": best["template"] if best else None,
+                "score": round(best["score"], 4) if best else 0.0,
+                "scores": result["scores"],
+            },
+        )
+
+
+@AgentServer.custom_recognition("ReadDigits")
+class ReadDigits(CustomRecognition):
+    def analyze(
+        self,
+        context: Context,
+        argv: CustomRecognition.AnalyzeArg,
+    ) -> CustomRecognition.AnalyzeResult:
+        param = parse_json_param(argv.custom_recognition_param)
+        roi = list(argv.roi)
+        ocr_name = param.get("ocr")
+        if not ocr_name or not roi[2] or not roi[3]:
+            return CustomRecognition.AnalyzeResult(box=None, detail={"error": "ReadDigits needs roi and ocr"})
+
+        read = read_digits(
+            context,
+            argv.image,
+            roi,
+            param.get("kind", ocr_name),
+            ocr_name,
+            param.get("alphabet", DIGIT_GLYPH_ALPHABET),
+        )
+        if read is None:
+            return CustomRecognition.AnalyzeResult(box=None, detail={})
+
+        return CustomRecognition.AnalyzeResult(box=tuple(roi), detail=read)
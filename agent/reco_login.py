@@ -1,3 +1,5 @@
+from typing import Optional
+
 from maa.agent.agent_server import AgentServer
 from maa.custom_recognition import CustomRecognition
 from maa.context import Context
@@ -6,12 +8,21 @@ from common import (
     find_server_ocr_result,
     get_detail_value,
     get_latest_detail,
+    get_node_attach,
+    get_node_next_names,
     has_node_hit,
+    infer_server_grid,
+    is_hit,
     run_recognition,
+    run_recognitions,
     send_focus_message,
     strip_quotes,
 )
-from constants import SERVER_1000_LIST_ROI
+from checkpoint import run_checkpoint
+from constants import LEVELING_EXIT_NODE, LEVELING_RESUME_NODE, SERVER_1000_LIST_ROI
+from row_ocr import run_row_ocr
+from run_state import RunState, get_current_server_id, get_run_state, get_state_value
+from server_index import schedule_servers, server_list_index, server_tab
 
 
 @AgentServer.custom_recognition("ParseServerRange")
@@ -34,12 +45,65 @@ class ParseServerRange(CustomRecognition):
             else:
                 server_list.append(int(range_part))
 
+        attach = get_node_attach(context, argv.node_name)
+        server_order = schedule_servers(server_list) if attach.get("reorder") else None
+
+        state = get_run_state(context)
+        state.server_list = server_list
+        state.server_order = server_order
+        state.server_index = 0
+        state.server_id = None
+        state.finished = None
+        state.resume_step = None
+
+        task_mode = _get_task_mode(context, argv)
+        checkpoint = None
+        if attach.get("resume"):
+            checkpoint = run_checkpoint.resumable(task_mode, server_list, server_order)
+
+        if checkpoint:
+            state.server_index = checkpoint["server_index"]
+            state.resume_step = checkpoint.get("step")
+            send_focus_message(
+                context,
+                f"从检查点继续: 服务器 {checkpoint.get('server_id')} "
+                f"({state.server_index + 1}/{len(server_list)}) {state.resume_step or ''}".rstrip(),
+            )
+        else:
+            run_checkpoint.start(task_mode, server_list, server_order)
+
         return CustomRecognition.AnalyzeResult(
             box=(0, 0, 100, 100),
-            detail={"server_list": server_list},
+            detail={"server_list": server_list, "server_order": server_order},
         )
 
 
+def _get_resume_steps(context: Context, step: Optional[str]) -> list[str]:
+    node_data = context.get_node_data(step) if step else None
+    if node_data is None:
+        return []
+
+    steps = []
+    for item in node_data.get("next", []) or []:
+        if not isinstance(item, dict) or item.get("jump_back"):
+            continue
+        name = item.get("name")
+        if name and name not in (step, LEVELING_EXIT_NODE):
+            steps.append(name)
+    return steps
+
+
+def _apply_leveling_resume(context: Context, state: RunState) -> None:
+    resume_steps = _get_resume_steps(context, state.resume_step)
+    state.resume_step = None
+    if not resume_steps and state.leveling_next is None:
+        return
+
+    if state.leveling_next is None:
+        state.leveling_next = get_node_next_names(context.get_node_data(LEVELING_RESUME_NODE))
+    context.override_next(LEVELING_RESUME_NODE, resume_steps + state.leveling_next)
+
+
 @AgentServer.custom_recognition("GetNextServer")
 class GetNextServer(CustomRecognition):
     def analyze(
@@ -47,42 +111,62 @@ class GetNextServer(CustomRecognition):
         context: Context,
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
-        prev_detail = get_latest_detail(context, "GetNextServer")
-        if prev_detail is None:
-            parse_detail = get_latest_detail(context, "ParseServer")
-            if parse_detail is None:
-                return CustomRecognition.AnalyzeResult(
-                    box=None,
-                    detail={"error": "ParseServer not found"},
-                )
-            server_list = parse_detail.get("server_list", [])
-            current_server_index = 0
-        else:
-            server_list = prev_detail.get("server_list", [])
-            current_server_index = prev_detail.get("server_index", 0)
+        state = get_run_state(context)
+        if state.server_list is None:
+            prev_detail = get_latest_detail(context, "GetNextServer")
+            if prev_detail is None:
+                parse_detail = get_latest_detail(context, "ParseServer")
+                if parse_detail is None:
+                    return CustomRecognition.AnalyzeResult(
+                        box=None,
+                        detail={"error": "ParseServer not found"},
+                    )
+                state.server_list = parse_detail.get("server_list", [])
+                state.server_order = parse_detail.get("server_order")
+                state.server_index = 0
+            else:
+                state.server_list = prev_detail.get("server_list", [])
+                state.server_order = prev_detail.get("server_order")
+                state.server_index = prev_detail.get("server_index", 0)
 
+        server_list = state.server_list
+        current_server_index = state.server_index
         if current_server_index >= len(server_list):
+            state.finished = True
+            run_checkpoint.clear()
             return CustomRecognition.AnalyzeResult(
                 box=(0, 0, 0, 0),
                 detail={
                     "server_list": server_list,
+                    "server_order": state.server_order,
                     "server_index": current_server_index,
                     "server_cnt": len(server_list),
                     "finished": True,
                 },
             )
 
-        current_server = server_list[current_server_index]
+        list_index = state.server_order[current_server_index] if state.server_order else current_server_index
+        current_server = server_list[list_index]
         next_server_index = current_server_index + 1
-        send_focus_message(
-            context,
-            f"准备处理服务器 {current_server} ({next_server_index}/{len(server_list)})",
-        )
+        state.server_id = current_server
+        state.server_index = next_server_index
+        state.finished = False
+        state.shopping_target = None
+        state.account_name = None
+        state.server_list_snapshot = None
+        run_checkpoint.record_server(current_server_index, current_server)
+        _apply_leveling_resume(context, state)
+        progress = f"{next_server_index}/{len(server_list)}"
+        if state.server_order:
+            progress += f"，范围内第 {list_index + 1} 个"
+        send_focus_message(context, f"准备处理服务器 {current_server} ({progress})")
 
         return CustomRecognition.AnalyzeResult(
             box=(0, 0, 0, 0),
             detail={
                 "server_list": server_list,
+                "server_order": state.server_order,
+                "list_index": list_index,
                 "server_id": current_server,
                 "server_index": next_server_index,
                 "server_cnt": len(server_list),
@@ -98,12 +182,12 @@ class DetectServerPage(CustomRecognition):
         context: Context,
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
-        target_server_id = get_detail_value(context, "GetNextServer", "server_id")
+        target_server_id = get_current_server_id(context)
         if target_server_id is None:
             return CustomRecognition.AnalyzeResult(box=None, detail={})
 
         roi = [403, 216, 236, 131]
-        expected = ".*1000.*" if target_server_id >= 1000 else ".*1-999.*"
+        expected = f".*{server_tab(target_server_id)}.*"
         reco_detail = run_recognition(
             context,
             "ChooseServerType",
@@ -129,22 +213,42 @@ class LocateServerButton(CustomRecognition):
         context: Context,
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
-        target_server_id = get_detail_value(context, "GetNextServer", "server_id")
+        target_server_id = get_current_server_id(context)
         if target_server_id is None:
             return CustomRecognition.AnalyzeResult(box=None, detail={})
 
-        reco_detail = run_recognition(
+        state = get_run_state(context)
+        snapshot, state.server_list_snapshot = state.server_list_snapshot, None
+        if snapshot and snapshot.matches(target_server_id, argv.image):
+            return CustomRecognition.AnalyzeResult(
+                box=snapshot.box,
+                detail={
+                    "server_id": target_server_id,
+                    "roi_used": SERVER_1000_LIST_ROI,
+                    "ocr_result": snapshot.text,
+                    "hit": True,
+                    "match_mode": snapshot.match_mode,
+                    "snapshot_seq": snapshot.frame_seq,
+                },
+            )
+
+        reco_detail = run_row_ocr(
             context,
             "ChooseServerButton",
             argv.image,
-            {
-                "ChooseServerButton": {
-                    "roi": SERVER_1000_LIST_ROI,
-                    "expected": rf".*(^|[^0-9]){target_server_id}([^0-9]|$).*",
-                }
-            },
+            SERVER_1000_LIST_ROI,
+            rf".*(^|[^0-9]){target_server_id}([^0-9]|$).*",
+        )
+        tab = server_tab(target_server_id)
+        scroll_offset = server_list_index.session_offsets.get(tab, 0)
+        matched_result, match_mode = find_server_ocr_result(
+            reco_detail,
+            target_server_id,
+            server_list_index.recorded_base(tab, scroll_offset),
         )
-        matched_result, match_mode = find_server_ocr_result(reco_detail, target_server_id)
+        grid = infer_server_grid(reco_detail)
+        if grid:
+            server_list_index.record(tab, scroll_offset, grid)
 
         return CustomRecognition.AnalyzeResult(
             box=matched_result.box if matched_result else None,
@@ -165,7 +269,7 @@ class AllCompleted(CustomRecognition):
         context: Context,
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
-        finished = get_detail_value(context, "GetNextServer", "finished")
+        finished = get_state_value(context, "finished", "GetNextServer", "finished")
         if not finished:
             return CustomRecognition.AnalyzeResult(box=None, detail={})
 
@@ -183,6 +287,7 @@ class SetTaskMode(CustomRecognition):
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
         task_mode = strip_quotes(argv.custom_recognition_param)
+        get_run_state(context).task_mode = task_mode or None
         return CustomRecognition.AnalyzeResult(
             box=(0, 0, 0, 0),
             detail={"task_mode": task_mode},
@@ -196,6 +301,10 @@ def _get_task_mode(context: Context, argv: CustomRecognition.AnalyzeArg):
     if entry == "AccountTraining":
         return "training"
 
+    task_mode = get_run_state(context).task_mode
+    if task_mode:
+        return task_mode
+
     if has_node_hit(context, "SetShoppingFestivalTaskMode"):
         shopping_mode = get_detail_value(context, "SetShoppingFestivalTaskMode", "task_mode")
         if shopping_mode:
@@ -246,9 +355,9 @@ class DetectLoginPopup(CustomRecognition):
         context: Context,
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
-        for reco_name in ["CheckAnnouncement", "CheckWelfare", "CheckReturnGift"]:
-            reco_detail = run_recognition(context, reco_name, argv.image)
-            if reco_detail and reco_detail.hit and reco_detail.best_result:
+        reco_names = ["CheckAnnouncement", "CheckWelfare", "CheckReturnGift"]
+        for reco_name, reco_detail in zip(reco_names, run_recognitions(context, argv.image, reco_names, first_hit=True)):
+            if is_hit(reco_detail):
                 return CustomRecognition.AnalyzeResult(
                     box=reco_detail.best_result.box,
                     detail={"popup_type": reco_name},
@@ -2,12 +2,38 @@ from maa.agent.agent_server import AgentServer
 from maa.custom_recognition import CustomRecognition
 from maa.context import Context
 
-from common import get_latest_detail, parse_digits, run_recognition, send_focus_message, strip_quotes
-from constants import SHOPPING_PRICE_OFFSET, SHOPPING_SLOT_ROIS, SHOPPING_TOTAL
-
+from common import (
+    is_hit,
+    parse_digits,
+    read_roi_texts,
+    run_recognition,
+    run_recognitions,
+    send_focus_message,
+    strip_quotes,
+)
+from constants import (
+    SHOPPING_GIFT_CHARS,
+    SHOPPING_GIFT_CONTROL_TEMPLATES,
+    SHOPPING_GIFT_COUNT_DIGITS,
+    SHOPPING_GIFT_COUNT_ROIS,
+    SHOPPING_PRICE_OFFSET,
+    SHOPPING_SLOT_ROIS,
+    SHOPPING_TOTAL,
+)
+from digit_glyph import classify_digits, learn_digits
+from run_state import get_run_state, get_shopping_target
 
 def _get_selected_shopping_detail(context: Context):
-    return get_latest_detail(context, "FindShoppingFestivalTarget")
+    return get_shopping_target(context)
+
+
+def _get_price_roi(slot_roi) -> list[int]:
+    return [
+        slot_roi[0] + SHOPPING_PRICE_OFFSET[0],
+        slot_roi[1] + SHOPPING_PRICE_OFFSET[1],
+        SHOPPING_PRICE_OFFSET[2],
+        SHOPPING_PRICE_OFFSET[3],
+    ]
 
 
 def _locate_in_selected_slot(context: Context, image, reco_name: str) -> CustomRecognition.AnalyzeResult:
@@ -29,6 +55,71 @@ def _locate_in_selected_slot(context: Context, image, reco_name: str) -> CustomR
     )
 
 
+def _parse_gift_count(text: str) -> int:
+    digits = parse_digits(text)
+    return int(digits) if digits in {"1", "2", "3"} else 0
+
+
+def recognize_gift_panel(context: Context, image) -> dict:
+    control_details = run_recognitions(context, image, list(SHOPPING_GIFT_CONTROL_TEMPLATES.values()))
+    controls = {
+        control: reco_detail.best_result.box if is_hit(reco_detail) else None
+        for control, reco_detail in zip(SHOPPING_GIFT_CONTROL_TEMPLATES, control_details)
+    }
+
+    gift_reads = [
+        classify_digits(image, gift_roi, "gift_count", SHOPPING_GIFT_COUNT_DIGITS)
+        for gift_roi in SHOPPING_GIFT_COUNT_ROIS
+    ]
+    gift_texts = [gift_read.text if gift_read else "" for gift_read in gift_reads]
+    unread = [index for index, gift_read in enumerate(gift_reads) if gift_read is None]
+    if unread:
+        strip_rois = [SHOPPING_GIFT_COUNT_ROIS[index] for index in unread]
+        strip_texts = read_roi_texts(context, image, "ShoppingFestivalGiftCountStripOCR", strip_rois)
+        for index, gift_text in zip(unread, strip_texts):
+            gift_texts[index] = gift_text
+    missing = [index for index in unread if not parse_digits(gift_texts[index])]
+    cell_details = run_recognitions(
+        context,
+        image,
+        [
+            ("ShoppingFestivalGiftCountOCR", {"ShoppingFestivalGiftCountOCR": {"roi": SHOPPING_GIFT_COUNT_ROIS[index]}})
+            for index in missing
+        ],
+    )
+    cell_texts = {
+        index: (reco_detail.best_result.text or "") if is_hit(reco_detail) else ""
+        for index, reco_detail in zip(missing, cell_details)
+    }
+
+    gifts = []
+    for index, (gift_roi, gift_text) in enumerate(zip(SHOPPING_GIFT_COUNT_ROIS, gift_texts), start=1):
+        source = "glyph" if gift_reads[index - 1] else "strip"
+        if index - 1 in cell_texts:
+            source = "cell"
+            gift_text = cell_texts[index - 1]
+        count = _parse_gift_count(gift_text)
+        if source != "glyph" and count:
+            learn_digits(image, gift_roi, "gift_count", str(count))
+
+        gifts.append(
+            {
+                "index": index,
+                "char": SHOPPING_GIFT_CHARS[index - 1],
+                "roi": gift_roi,
+                "text": gift_text,
+                "count": count,
+                "source": source,
+            }
+        )
+
+    return {
+        "controls": controls,
+        "controls_found": all(controls.values()),
+        "gifts": gifts,
+    }
+
+
 @AgentServer.custom_recognition("FindShoppingFestivalTarget")
 class FindShoppingFestivalTarget(CustomRecognition):
     def analyze(
@@ -36,43 +127,49 @@ class FindShoppingFestivalTarget(CustomRecognition):
         context: Context,
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
-        for index, slot_roi in enumerate(SHOPPING_SLOT_ROIS, start=1):
-            price_roi = [
-                slot_roi[0] + SHOPPING_PRICE_OFFSET[0],
-                slot_roi[1] + SHOPPING_PRICE_OFFSET[1],
-                SHOPPING_PRICE_OFFSET[2],
-                SHOPPING_PRICE_OFFSET[3],
-            ]
-
-            reco_detail = run_recognition(
-                context,
-                "ShoppingFestivalPriceOCR",
-                argv.image,
-                {"ShoppingFestivalPriceOCR": {"roi": price_roi}},
-            )
-
-            price_text = ""
-            if reco_detail and reco_detail.hit and reco_detail.best_result:
-                price_text = reco_detail.best_result.text or ""
+        price_rois = [_get_price_roi(slot_roi) for slot_roi in SHOPPING_SLOT_ROIS]
+        price_reads = [classify_digits(argv.image, price_roi, "price") for price_roi in price_rois]
+        ocr_rois = [price_roi for price_roi, price_read in zip(price_rois, price_reads) if price_read is None]
+        ocr_texts = iter(read_roi_texts(context, argv.image, "ShoppingFestivalPriceOCR", ocr_rois) if ocr_rois else [])
+        price_texts = [price_read.text if price_read else next(ocr_texts) for price_read in price_reads]
+
+        for index, (slot_roi, price_roi, price_text, price_read) in enumerate(
+            zip(SHOPPING_SLOT_ROIS, price_rois, price_texts, price_reads),
+            start=1,
+        ):
+            if price_read is None:
+                if not parse_digits(price_text):
+                    reco_detail = run_recognition(
+                        context,
+                        "ShoppingFestivalPriceOCR",
+                        argv.image,
+                        {"ShoppingFestivalPriceOCR": {"roi": price_roi}},
+                    )
+                    if reco_detail and reco_detail.hit and reco_detail.best_result:
+                        price_text = reco_detail.best_result.text or ""
 
             digits = parse_digits(price_text)
             price = int(digits) if digits else 0
 
             if price > 0 and SHOPPING_TOTAL % price == 0:
+                if price_read is None:
+                    learn_digits(argv.image, price_roi, "price", digits)
                 quantity = SHOPPING_TOTAL // price
                 send_focus_message(
                     context,
                     f"购物节选中槽位 {index}，单价 {price}，购买数量 {quantity}",
                 )
+                detail = {
+                    "slot_index": index,
+                    "slot_roi": slot_roi,
+                    "price_roi": price_roi,
+                    "price": price,
+                    "quantity": quantity,
+                }
+                get_run_state(context).shopping_target = detail
                 return CustomRecognition.AnalyzeResult(
                     box=tuple(slot_roi),
-                    detail={
-                        "slot_index": index,
-                        "slot_roi": slot_roi,
-                        "price_roi": price_roi,
-                        "price": price,
-                        "quantity": quantity,
-                    },
+                    detail=detail,
                 )
 
         return CustomRecognition.AnalyzeResult(
@@ -109,7 +206,25 @@ class GenerateShoppingFriendName(CustomRecognition):
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
         friend_name = strip_quotes(argv.custom_recognition_param)
+        get_run_state(context).friend_name = friend_name or None
         return CustomRecognition.AnalyzeResult(
             box=(0, 0, 0, 0),
             detail={"friend_name": friend_name},
         )
+
+
+@AgentServer.custom_recognition("RecognizeShoppingFestivalGifts")
+class RecognizeShoppingFestivalGifts(CustomRecognition):
+    def analyze(
+        self,
+        context: Context,
+        argv: CustomRecognition.AnalyzeArg,
+    ) -> CustomRecognition.AnalyzeResult:
+        panel = recognize_gift_panel(context, argv.image)
+        if not panel["controls_found"]:
+            return CustomRecognition.AnalyzeResult(box=None, detail=panel)
+
+        return CustomRecognition.AnalyzeResult(
+            box=tuple(panel["controls"]["send"]),
+            detail=panel,
+        )
@@ -1,8 +1,27 @@
+import re
+from collections import Counter
+from typing import Any, Optional
+
 from maa.agent.agent_server import AgentServer
 from maa.custom_recognition import CustomRecognition
 from maa.context import Context
 
-from common import get_detail_value, send_focus_message, strip_quotes
+from checkpoint import run_checkpoint
+from common import collect_node_chain, parse_json_param, send_focus_message, strip_quotes
+from constants import (
+    LEVELING_EXIT_NODE,
+    LEVELING_QUEST_TEMPLATE_PATTERN,
+    LEVELING_STEP_SCORE_MARGIN,
+    LEVELING_START_STEP,
+    LEVELING_STEP_PREFIX,
+    STALL_DEFAULT_SECONDS,
+    TEMPLATE_DEFAULT_THRESHOLD,
+)
+from run_state import get_current_server_id, get_run_state
+from template_match import get_template_bank
+from stall import stall_watchdog
+
+_leveling_step_index: Optional[dict[str, Any]] = None
 
 
 @AgentServer.custom_recognition("GenerateAccountName")
@@ -12,15 +31,137 @@ class GenerateAccountName(CustomRecognition):
         context: Context,
         argv: CustomRecognition.AnalyzeArg,
     ) -> CustomRecognition.AnalyzeResult:
-        server_id = get_detail_value(context, "GetNextServer", "server_id")
+        server_id = get_current_server_id(context)
         if server_id is None:
             return CustomRecognition.AnalyzeResult(box=None, detail={})
 
         prefix = strip_quotes(argv.custom_recognition_param)
         account_name = f"{prefix}_{server_id}"
+        get_run_state(context).account_name = account_name
         send_focus_message(context, f"生成账号名称: {account_name}")
 
         return CustomRecognition.AnalyzeResult(
             box=(0, 0, 0, 0),
             detail={"AccountName": account_name},
         )
+
+
+def _get_leveling_step_index(context: Context) -> dict[str, Any]:
+    global _leveling_step_index
+    if _leveling_step_index is not None:
+        return _leveling_step_index
+
+    pattern = re.compile(LEVELING_QUEST_TEMPLATE_PATTERN)
+    chain = collect_node_chain(context, LEVELING_START_STEP, LEVELING_STEP_PREFIX, (LEVELING_EXIT_NODE,))
+    order = {}
+    groups = {}
+    usage = Counter()
+
+    for step_name, node_data in chain.items():
+        order[step_name] = len(order)
+        recognition = node_data.get("recognition") or {}
+        if recognition.get("type") != "TemplateMatch":
+            continue
+
+        param = recognition.get("param") or {}
+        templates = param.get("template") or []
+        thresholds = param.get("threshold") or []
+        for index, template in enumerate(templates):
+            if not pattern.match(template):
+                continue
+
+            threshold = thresholds[min(index, len(thresholds) - 1)] if thresholds else TEMPLATE_DEFAULT_THRESHOLD
+            roi = tuple(param.get("roi") or ())
+            group = groups.setdefault(roi, {"roi": list(roi), "thresholds": {}, "steps": {}})
+            group["thresholds"][template] = min(group["thresholds"].get(template, threshold), threshold)
+            group["steps"].setdefault(template, []).append(step_name)
+            usage[template] += 1
+
+    _leveling_step_index = {"order": order, "groups": list(groups.values()), "usage": usage}
+    return _leveling_step_index
+
+
+def _choose_leveling_step(index: dict[str, Any], matches: list[dict[str, Any]], last_step: Optional[str]):
+    order = index["order"]
+    best_score = max(match["score"] for match in matches)
+    candidates = [
+        (step_name, match)
+        for match in matches
+        if match["score"] >= best_score - LEVELING_STEP_SCORE_MARGIN
+        for step_name in match["steps"]
+    ]
+    if last_step in order:
+        forward = [item for item in candidates if order[item[0]] > order[last_step]]
+        if forward:
+            return min(forward, key=lambda item: order[item[0]])
+
+    return min(
+        candidates,
+        key=lambda item: (index["usage"][item[1]["template"]] > 1, order[item[0]]),
+    )
+
+
+@AgentServer.custom_recognition("DetectLevelingStep")
+class DetectLevelingStep(CustomRecognition):
+    def analyze(
+        self,
+        context: Context,
+        argv: CustomRecognition.AnalyzeArg,
+    ) -> CustomRecognition.AnalyzeResult:
+        index = _get_leveling_step_index(context)
+
+        matches = []
+        for group in index["groups"]:
+            result = get_template_bank(list(group["thresholds"])).match(argv.image, group["roi"])
+            for template, threshold in group["thresholds"].items():
+                template_result = result["results"][template]
+                if template_result["box"] and template_result["score"] >= threshold:
+                    matches.append(
+                        {
+                            "template": template,
+                            "steps": group["steps"][template],
+                            "box": template_result["box"],
+                            "score": template_result["score"],
+                        }
+                    )
+
+        if not matches:
+            return CustomRecognition.AnalyzeResult(box=None, detail={})
+
+        last_step = run_checkpoint.last_step(get_current_server_id(context))
+        step_name, match = _choose_leveling_step(index, matches, last_step)
+        send_focus_message(context, f"识别到练级步骤: {step_name}")
+
+        return CustomRecognition.AnalyzeResult(
+            box=tuple(match["box"]),
+            detail={
+                "step": step_name,
+                "template": match["template"],
+                "score": round(match["score"], 4),
+                "candidates": [name for item in matches for name in item["steps"]],
+            },
+        )
+
+
+@AgentServer.custom_recognition("DetectStall")
+class DetectStall(CustomRecognition):
+    def analyze(
+        self,
+        context: Context,
+        argv: CustomRecognition.AnalyzeArg,
+    ) -> CustomRecognition.AnalyzeResult:
+        param = parse_json_param(argv.custom_recognition_param)
+        stall_seconds = param.get("stall_seconds", STALL_DEFAULT_SECONDS)
+
+        stalled = stall_watchdog.stalled_for(argv.image)
+        detail = {"stalled": round(stalled, 1), "step": stall_watchdog.marker}
+        if stalled < stall_seconds:
+            return CustomRecognition.AnalyzeResult(box=None, detail=detail)
+
+        server_id = get_current_server_id(context)
+        if not stall_watchdog.can_recover(server_id):
+            detail["exhausted"] = True
+            return CustomRecognition.AnalyzeResult(box=None, detail=detail)
+
+        detail["server_id"] = server_id
+        return CustomRecognition.AnalyzeResult(box=(0, 0, 0, 0), detail=detail)
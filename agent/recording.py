@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy
+from maa.agent.agent_server import AgentServer
+
+from constants import RECORD_DIR, RECORD_EVENTS_FILE, RECORD_FRAME_DIR
+
+
+def recording_enabled() -> bool:
+    return os.environ.get("MAANOP_RECORD", "0") != "0"
+
+
+def _digest(frame) -> bytes:
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr((frame.shape, frame.dtype.str)).encode())
+    hasher.update(memoryview(frame).cast("B"))
+    return hasher.digest()
+
+
+class SessionRecorder:
+    def __init__(self, path: Path):
+        self.path = path
+        self.frame_dir = path / RECORD_FRAME_DIR
+        self.frame_dir.mkdir(parents=True, exist_ok=True)
+        self._events = open(path / RECORD_EVENTS_FILE, "a", encoding="utf-8")
+        self._frames: dict[bytes, int] = {}
+        self._last_frame: Optional[int] = None
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def _write(self, event: dict[str, Any]) -> None:
+        event["t"] = round(time.monotonic() - self._start, 3)
+        self._events.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._events.flush()
+
+    def frame(self, image, source: str) -> None:
+        if image is None:
+            return
+
+        frame = numpy.ascontiguousarray(image)
+        digest = _digest(frame)
+        with self._lock:
+            index = self._frames.get(digest)
+            if index is None:
+                index = len(self._frames)
+                numpy.savez_compressed(self.frame_dir / f"{index:06d}.npz", frame=frame)
+                self._frames[digest] = index
+            if index == self._last_frame:
+                return
+            self._last_frame = index
+            self._write({"type": "frame", "frame": index, "source": source})
+
+    def input(self, kind: str, **values: Any) -> None:
+        with self._lock:
+            self._last_frame = None
+            self._write({"type": kind, **values})
+
+
+recorder: Optional[SessionRecorder] = None
+
+
+def record_frame(image, source: str) -> None:
+    if recorder:
+        recorder.frame(image, source)
+
+
+def record_input(kind: str, **values: Any) -> None:
+    if recorder:
+        recorder.input(kind, **values)
+
+
+def _wrap(name: str, method):
+    def recorded(context, argv):
+        record_frame(argv.image, f"recognition:{name}")
+        return method(context, argv)
+
+    return recorded
+
+
+def install() -> None:
+    global recorder
+    if not recording_enabled():
+        return
+
+    session_dir = RECORD_DIR / time.strftime("%Y%m%d_%H%M%S")
+    try:
+        recorder = SessionRecorder(session_dir)
+    except OSError:
+        return
+
+    for name, recognition in AgentServer._custom_recognition_holder.items():
+        recognition.analyze = _wrap(name, recognition.analyze)
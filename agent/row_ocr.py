@@ -0,0 +1,123 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy
+from maa.context import Context
+
+import profiling
+from common import RecognitionCache, group_results_by_roi, run_recognition
+from constants import OCR_ROW_ACTIVITY, OCR_ROW_CACHE_SIZE, OCR_ROW_MIN_GAP, OCR_ROW_PADDING
+from template_match import to_gray
+
+
+@dataclass(frozen=True)
+class RowOCRResult:
+    text: str
+    box: tuple[int, int, int, int]
+    score: float
+
+
+@dataclass(frozen=True)
+class RowOCRDetail:
+    hit: bool
+    best_result: Optional[RowOCRResult]
+    all_results: list[RowOCRResult]
+    filtered_results: list[RowOCRResult]
+
+
+row_ocr_cache = RecognitionCache(OCR_ROW_CACHE_SIZE)
+
+
+def split_rows(gray) -> list[tuple[int, int]]:
+    activity = numpy.abs(numpy.diff(gray, axis=1)).mean(axis=1)
+    edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], (activity > OCR_ROW_ACTIVITY).astype(int), [0]))))
+
+    bands: list[list[int]] = []
+    for start, end in zip(edges[0::2], edges[1::2]):
+        if bands and start - bands[-1][1] < OCR_ROW_MIN_GAP:
+            bands[-1][1] = int(end)
+        else:
+            bands.append([int(start), int(end)])
+
+    rows = []
+    for index, (start, end) in enumerate(bands):
+        top = max(start - OCR_ROW_PADDING, rows[-1][1] if rows else 0)
+        bottom = min(end + OCR_ROW_PADDING, bands[index + 1][0] if index + 1 < len(bands) else gray.shape[0])
+        rows.append((top, bottom))
+    return rows
+
+
+def _row_key(reco_name: str, pixels) -> bytes:
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr((reco_name, pixels.shape, pixels.dtype.str)).encode())
+    hasher.update(memoryview(numpy.ascontiguousarray(pixels)).cast("B"))
+    return hasher.digest()
+
+
+def _missing_runs(indexes: list[int]) -> list[list[int]]:
+    runs: list[list[int]] = []
+    for index in indexes:
+        if runs and runs[-1][-1] == index - 1:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+    return runs
+
+
+def run_row_ocr(context: Context, reco_name: str, image, roi: Sequence[int], expected: str) -> RowOCRDetail:
+    x, y, width, height = roi
+    crop = numpy.asarray(image)[y : y + height, x : x + width]
+    rows = split_rows(to_gray(crop)) or [(0, crop.shape[0])]
+    keys = [_row_key(reco_name, crop[top:bottom]) for top, bottom in rows]
+    row_results = [row_ocr_cache.get(key) for key in keys]
+
+    missing = [index for index, results in enumerate(row_results) if results is None]
+    for run in _missing_runs(missing):
+        top, bottom = rows[run[0]][0], rows[run[-1]][1]
+        reco_detail = run_recognition(
+            context,
+            reco_name,
+            image,
+            {reco_name: {"roi": [x, y + top, width, bottom - top], "expected": expected}},
+        )
+        if reco_detail is None:
+            for index in run:
+                row_results[index] = []
+            continue
+
+        row_rois = [[x, y + rows[index][0], width, rows[index][1] - rows[index][0]] for index in run]
+        grouped = group_results_by_roi(getattr(reco_detail, "all_results", None), row_rois)
+        for index, results in zip(run, grouped):
+            row_top = y + rows[index][0]
+            row_results[index] = [
+                RowOCRResult(
+                    text=getattr(result, "text", "") or "",
+                    box=(int(result.box[0]), int(result.box[1]) - row_top, int(result.box[2]), int(result.box[3])),
+                    score=float(getattr(result, "score", 0.0)),
+                )
+                for result in results
+            ]
+            row_ocr_cache.put(keys[index], row_results[index])
+
+    profiling.count("ocr_rows", len(rows))
+    profiling.count("cached_ocr_rows", len(rows) - len(missing))
+
+    all_results = [
+        RowOCRResult(
+            text=result.text,
+            box=(result.box[0], result.box[1] + y + top, result.box[2], result.box[3]),
+            score=result.score,
+        )
+        for (top, _), results in zip(rows, row_results)
+        for result in results
+    ]
+    pattern = re.compile(expected)
+    filtered_results = [result for result in all_results if pattern.search(result.text)]
+    return RowOCRDetail(
+        hit=bool(filtered_results),
+        best_result=filtered_results[0] if filtered_results else None,
+        all_results=all_results,
+        filtered_results=filtered_results,
+    )
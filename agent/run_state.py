@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from maa.context import Context
+
+from common import ServerListSnapshot, get_detail_value, get_latest_detail
+
+
+@dataclass
+class RunState:
+    task_id: int
+    task_mode: Optional[str] = None
+    server_list: Optional[list[int]] = None
+    server_order: Optional[list[int]] = None
+    server_index: int = 0
+    server_id: Optional[int] = None
+    finished: Optional[bool] = None
+    shopping_target: Optional[dict[str, Any]] = None
+    friend_name: Optional[str] = None
+    account_name: Optional[str] = None
+    resume_step: Optional[str] = None
+    leveling_next: Optional[list[str]] = None
+    server_list_snapshot: Optional[ServerListSnapshot] = None
+    adaptive_delays: Optional[dict[str, tuple[float, float]]] = None
+
+
+_run_state: Optional[RunState] = None
+
+
+def _get_task_id(context: Context) -> int:
+    try:
+        return context.get_task_job().job_id
+    except ValueError:
+        return 0
+
+
+def get_run_state(context: Context) -> RunState:
+    global _run_state
+    task_id = _get_task_id(context)
+    if _run_state is None or _run_state.task_id != task_id:
+        _run_state = RunState(task_id=task_id)
+    return _run_state
+
+
+def get_state_value(context: Context, attr: str, node_name: str, key: str) -> Any:
+    state = get_run_state(context)
+    value = getattr(state, attr)
+    if value is None:
+        value = get_detail_value(context, node_name, key)
+        if value is not None:
+            setattr(state, attr, value)
+    return value
+
+
+def get_current_server_id(context: Context) -> Optional[int]:
+    return get_state_value(context, "server_id", "GetNextServer", "server_id")
+
+
+def get_shopping_target(context: Context) -> Optional[dict[str, Any]]:
+    state = get_run_state(context)
+    if state.shopping_target is None:
+        state.shopping_target = get_latest_detail(context, "FindShoppingFestivalTarget")
+    return state.shopping_target
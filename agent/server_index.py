@@ -0,0 +1,136 @@
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+from constants import SERVER_INDEX_DRIFT_CONFIRMATIONS, SERVER_INDEX_PATH
+
+
+def server_tab(server_id: int) -> str:
+    return "1000" if server_id >= 1000 else "1-999"
+
+
+def schedule_servers(server_list: list[int]) -> list[int]:
+    if not server_list:
+        return []
+
+    first_tab = server_tab(server_list[0])
+    return sorted(
+        range(len(server_list)),
+        key=lambda index: (server_tab(server_list[index]) != first_tab, -server_list[index]),
+    )
+
+
+def _grid_contains(grid: dict[str, int], server_id: int) -> bool:
+    target_index = grid["base"] - server_id
+    return 0 <= target_index < grid["row_count"] * grid["col_count"]
+
+
+class ServerListIndex:
+    def __init__(self, path: Path):
+        self.path = path
+        self.session_offsets: dict[str, int] = {}
+        self._pending_drifts: dict[str, tuple[int, set[str]]] = {}
+        self._tabs: Optional[dict[str, Any]] = None
+
+    def _load(self) -> dict[str, Any]:
+        if self._tabs is not None:
+            return self._tabs
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                tabs = json.load(f).get("tabs", {})
+        except (OSError, ValueError, AttributeError):
+            tabs = {}
+
+        self._tabs = tabs if isinstance(tabs, dict) else {}
+        return self._tabs
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"tabs": self._load()}, f, ensure_ascii=False, indent=4)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def _tab(self, tab: str) -> dict[str, Any]:
+        tab_data = self._load().setdefault(tab, {})
+        tab_data.setdefault("offsets", {})
+        return tab_data
+
+    def rows_per_click(self, tab: str) -> Optional[float]:
+        return self._tab(tab).get("rows_per_click")
+
+    def recorded_base(self, tab: str, offset: int) -> Optional[int]:
+        grid = self._tab(tab)["offsets"].get(str(offset))
+        return grid["base"] if grid else None
+
+    def record(self, tab: str, offset: int, grid: dict[str, int], rows_per_click: Optional[float] = None) -> None:
+        tab_data = self._tab(tab)
+        offsets = tab_data["offsets"]
+        changed = False
+
+        previous = offsets.get(str(offset))
+        pending = self._pending_drifts.get(tab)
+        if previous and previous["base"] != grid["base"]:
+            changed = self._note_drift(tab, str(offset), grid["base"] - previous["base"])
+        elif previous and pending and str(offset) not in pending[1]:
+            del self._pending_drifts[tab]
+
+        entry = {"base": grid["base"], "col_count": grid["col_count"], "row_count": grid["row_count"]}
+        if offsets.get(str(offset)) != entry:
+            offsets[str(offset)] = entry
+            changed = True
+
+        if rows_per_click and tab_data.get("rows_per_click") != rows_per_click:
+            tab_data["rows_per_click"] = rows_per_click
+            changed = True
+
+        if changed:
+            self._save()
+
+    def _note_drift(self, tab: str, offset: str, drift: int) -> bool:
+        pending_drift, drifted = self._pending_drifts.get(tab, (drift, set()))
+        if pending_drift != drift:
+            drifted = set()
+        drifted.add(offset)
+        if len(drifted) < SERVER_INDEX_DRIFT_CONFIRMATIONS:
+            self._pending_drifts[tab] = (drift, drifted)
+            return False
+
+        del self._pending_drifts[tab]
+        for recorded_offset, recorded in self._tab(tab)["offsets"].items():
+            if recorded_offset not in drifted:
+                recorded["base"] += drift
+        return True
+
+    def lookup_offset(self, tab: str, server_id: int) -> Optional[int]:
+        tab_data = self._tab(tab)
+        offsets = sorted((int(offset), grid) for offset, grid in tab_data["offsets"].items())
+
+        for offset, grid in offsets:
+            if _grid_contains(grid, server_id):
+                return offset
+
+        rows_per_click = tab_data.get("rows_per_click")
+        if not rows_per_click:
+            return None
+
+        best_offset = None
+        for offset, grid in offsets:
+            target_index = grid["base"] - server_id
+            if target_index < 0:
+                break
+
+            last_full_row = grid["row_count"] - 1
+            rows = target_index // grid["col_count"] - last_full_row
+            best_offset = offset + math.ceil(rows / rows_per_click)
+
+        return best_offset
+
+
+server_list_index = ServerListIndex(SERVER_INDEX_PATH)
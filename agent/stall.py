@@ -0,0 +1,49 @@
+import time
+from collections import Counter
+from typing import Optional
+
+from common import frame_difference, frame_signature
+from constants import SCREEN_CHANGE_THRESHOLD, STALL_CHECK_GAP, STALL_MAX_RECOVERIES
+
+
+class StallWatchdog:
+    def __init__(self):
+        self.marker: Optional[str] = None
+        self.recoveries: Counter = Counter()
+        self._step_recoveries: Counter = Counter()
+        self._signature = None
+        self._changed_at = time.monotonic()
+        self._checked_at = 0.0
+
+    def note_progress(self, marker: str) -> None:
+        if marker != self.marker:
+            self.marker = marker
+            self._changed_at = time.monotonic()
+
+    def reset(self) -> None:
+        self._signature = None
+        self._changed_at = time.monotonic()
+
+    def stalled_for(self, image) -> float:
+        now = time.monotonic()
+        signature = frame_signature(image)
+        if (
+            self._signature is None
+            or now - self._checked_at > STALL_CHECK_GAP
+            or frame_difference(signature, self._signature) > SCREEN_CHANGE_THRESHOLD
+        ):
+            self._signature = signature
+            self._changed_at = now
+        self._checked_at = now
+        return now - self._changed_at
+
+    def can_recover(self, server_id: Optional[int]) -> bool:
+        return self._step_recoveries[(server_id, self.marker)] < STALL_MAX_RECOVERIES
+
+    def record_recovery(self, server_id: Optional[int]) -> int:
+        self._step_recoveries[(server_id, self.marker)] += 1
+        self.recoveries[server_id] += 1
+        return self.recoveries[server_id]
+
+
+stall_watchdog = StallWatchdog()
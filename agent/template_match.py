@@ -0,0 +1,301 @@
+import struct
+import weakref
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy
+
+from constants import (
+    TEMPLATE_DEFAULT_THRESHOLD,
+    TEMPLATE_FRAME_MEMO_SIZE,
+    TEMPLATE_IMAGE_DIRS,
+)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+MIN_WINDOW_VARIANCE = 1e-2
+
+
+def _unfilter_row(filter_type: int, row, previous, channels: int):
+    if filter_type == 0:
+        return row
+    if filter_type == 1:
+        return numpy.cumsum(row.reshape(-1, channels), axis=0, dtype=numpy.uint8).reshape(-1)
+    if filter_type == 2:
+        return row + previous
+
+    result = row.copy()
+    for x in range(len(row)):
+        left = int(result[x - channels]) if x >= channels else 0
+        up = int(previous[x])
+        if filter_type == 3:
+            result[x] = (int(row[x]) + (left + up) // 2) & 0xFF
+            continue
+
+        up_left = int(previous[x - channels]) if x >= channels else 0
+        estimate = left + up - up_left
+        distances = (abs(estimate - left), abs(estimate - up), abs(estimate - up_left))
+        predictor = (left, up, up_left)[distances.index(min(distances))]
+        result[x] = (int(row[x]) + predictor) & 0xFF
+    return result
+
+
+def decode_png(path: Path):
+    data = path.read_bytes()
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError(f"{path} is not a PNG file")
+
+    position = len(PNG_SIGNATURE)
+    header = None
+    compressed = []
+    while position < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[position : position + 8])
+        body = data[position + 8 : position + 8 + length]
+        position += length + 12
+        if chunk_type == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif chunk_type == b"IDAT":
+            compressed.append(body)
+        elif chunk_type == b"IEND":
+            break
+
+    if header is None:
+        raise ValueError(f"{path} has no IHDR chunk")
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if bit_depth != 8 or interlace or color_type not in PNG_CHANNELS:
+        raise ValueError(f"{path} uses an unsupported PNG format")
+
+    channels = PNG_CHANNELS[color_type]
+    stride = width * channels
+    raw = numpy.frombuffer(zlib.decompress(b"".join(compressed)), dtype=numpy.uint8)
+    rows = raw.reshape(height, stride + 1)
+    pixels = numpy.empty((height, stride), dtype=numpy.uint8)
+    previous = numpy.zeros(stride, dtype=numpy.uint8)
+    for y in range(height):
+        previous = pixels[y] = _unfilter_row(int(rows[y, 0]), rows[y, 1:], previous, channels)
+
+    image = pixels.reshape(height, width, channels)
+    if channels >= 3:
+        return image[:, :, 2::-1]
+    return image[:, :, :1]
+
+
+def _png_chunk(chunk_type: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + chunk_type + body + struct.pack(">I", zlib.crc32(chunk_type + body))
+
+
+def encode_png(gray) -> bytes:
+    pixels = numpy.ascontiguousarray(gray, dtype=numpy.uint8)
+    height, width = pixels.shape
+    raw = numpy.hstack([numpy.zeros((height, 1), dtype=numpy.uint8), pixels]).tobytes()
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(raw))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def to_gray(image):
+    image = numpy.asarray(image)
+    if image.ndim == 2:
+        return image.astype(numpy.float32)
+    if image.shape[2] == 1:
+        return image[:, :, 0].astype(numpy.float32)
+    blue, green, red = (image[:, :, index].astype(numpy.float32) for index in range(3))
+    return 0.114 * blue + 0.587 * green + 0.299 * red
+
+
+def to_color(image):
+    image = numpy.asarray(image)
+    if image.ndim == 2:
+        image = image[:, :, None]
+    if image.shape[2] == 1:
+        image = numpy.repeat(image, 3, axis=2)
+    return image[:, :, :3].astype(numpy.float32)
+
+
+def find_template_path(name: str) -> Optional[Path]:
+    for image_dir in TEMPLATE_IMAGE_DIRS:
+        path = image_dir / name
+        if path.exists():
+            return path
+    return None
+
+
+def resolve_templates(patterns: Sequence[str]) -> list[str]:
+    names = []
+    for pattern in patterns:
+        for image_dir in TEMPLATE_IMAGE_DIRS:
+            matches = sorted(path.relative_to(image_dir).as_posix() for path in image_dir.glob(pattern))
+            if matches:
+                names.extend(name for name in matches if name not in names)
+                break
+    return names
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str):
+    path = find_template_path(name)
+    if path is None:
+        raise FileNotFoundError(f"Template not found: {name}")
+    return to_gray(decode_png(path))
+
+
+@lru_cache(maxsize=None)
+def load_color_template(name: str):
+    path = find_template_path(name)
+    if path is None:
+        raise FileNotFoundError(f"Template not found: {name}")
+    return to_color(decode_png(path))
+
+
+class PreparedImage:
+    def __init__(self, pixels):
+        self.pixels = pixels
+        self._integrals = None
+        self._spectra = {}
+
+    def integrals(self):
+        if self._integrals is None:
+            pixels = self.pixels.astype(numpy.float64)
+            integral = numpy.zeros((pixels.shape[0] + 1, pixels.shape[1] + 1, pixels.shape[2]))
+            integral_sq = numpy.zeros_like(integral)
+            integral[1:, 1:] = pixels.cumsum(axis=0).cumsum(axis=1)
+            integral_sq[1:, 1:] = (pixels * pixels).cumsum(axis=0).cumsum(axis=1)
+            self._integrals = (integral, integral_sq)
+        return self._integrals
+
+    def spectrum(self, shape: tuple[int, int]):
+        spectrum = self._spectra.get(shape)
+        if spectrum is None:
+            spectrum = self._spectra[shape] = numpy.fft.rfft2(self.pixels, shape, axes=(0, 1))
+        return spectrum
+
+
+def _window_sums(integral, height: int, width: int):
+    return integral[height:, width:] - integral[:-height, width:] - integral[height:, :-width] + integral[:-height, :-width]
+
+
+def _fft_shape(image_shape, template_shapes) -> tuple[int, int]:
+    height = image_shape[0] + max(shape[0] for shape in template_shapes)
+    width = image_shape[1] + max(shape[1] for shape in template_shapes)
+    return tuple(1 << (size - 1).bit_length() for size in (height, width))
+
+
+def match_scores(image: PreparedImage, template, fft_shape: Optional[tuple[int, int]] = None):
+    height, width = template.shape[:2]
+    image_height, image_width = image.pixels.shape[:2]
+    if height > image_height or width > image_width:
+        return None
+
+    centered = template.astype(numpy.float64) - template.mean(axis=(0, 1))
+    template_norm = numpy.sqrt((centered * centered).sum())
+    if template_norm == 0:
+        return numpy.zeros((image_height - height + 1, image_width - width + 1), dtype=numpy.float32)
+
+    fft_shape = fft_shape or _fft_shape(image.pixels.shape, [template.shape])
+    kernel = numpy.fft.rfft2(centered[::-1, ::-1], fft_shape, axes=(0, 1))
+    correlation = numpy.fft.irfft2(image.spectrum(fft_shape) * kernel, fft_shape, axes=(0, 1)).sum(axis=2)
+    numerator = correlation[height - 1 : image_height, width - 1 : image_width]
+
+    integral, integral_sq = image.integrals()
+    sums = _window_sums(integral, height, width)
+    variance = (_window_sums(integral_sq, height, width) - sums * sums / (height * width)).sum(axis=2)
+    denominator = numpy.sqrt(numpy.maximum(variance, 0)) * template_norm
+
+    scores = numpy.zeros_like(numerator)
+    valid = variance > MIN_WINDOW_VARIANCE * height * width
+    scores[valid] = numerator[valid] / denominator[valid]
+    return numpy.clip(scores, -1, 1).astype(numpy.float32)
+
+
+_prepared_frames: "OrderedDict[int, tuple[weakref.ref, dict]]" = OrderedDict()
+
+
+def _frame_regions(image) -> dict:
+    frame_id = id(image)
+    memo = _prepared_frames.get(frame_id)
+    if memo is not None and memo[0]() is image:
+        _prepared_frames.move_to_end(frame_id)
+        return memo[1]
+
+    regions = {}
+    try:
+        _prepared_frames[frame_id] = (weakref.ref(image), regions)
+    except TypeError:
+        return regions
+    _prepared_frames.move_to_end(frame_id)
+    while len(_prepared_frames) > TEMPLATE_FRAME_MEMO_SIZE:
+        _prepared_frames.popitem(last=False)
+    return regions
+
+
+def prepare_roi(image, roi: Optional[Sequence[int]] = None) -> tuple[PreparedImage, tuple[int, int]]:
+    frame_height, frame_width = image.shape[:2]
+    x, y, width, height = roi if roi and roi[2] > 0 and roi[3] > 0 else (0, 0, frame_width, frame_height)
+    x, y = max(int(x), 0), max(int(y), 0)
+    right, bottom = min(x + int(width), frame_width), min(y + int(height), frame_height)
+
+    regions = _frame_regions(image)
+    key = (x, y, right, bottom)
+    prepared = regions.get(key)
+    if prepared is None:
+        prepared = regions[key] = PreparedImage(to_color(image[y:bottom, x:right]))
+    return prepared, (x, y)
+
+
+class TemplateBank:
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+        self.templates = {name: load_color_template(name) for name in self.names}
+
+    def match(
+        self,
+        image,
+        roi: Optional[Sequence[int]] = None,
+        threshold: float = TEMPLATE_DEFAULT_THRESHOLD,
+    ) -> dict[str, Any]:
+        prepared, (offset_x, offset_y) = prepare_roi(image, roi)
+        fitting = {
+            name: template
+            for name, template in self.templates.items()
+            if template.shape[0] <= prepared.pixels.shape[0] and template.shape[1] <= prepared.pixels.shape[1]
+        }
+
+        results = {name: {"score": 0.0, "box": None} for name in self.names}
+        if fitting:
+            fft_shape = _fft_shape(prepared.pixels.shape, [template.shape for template in fitting.values()])
+            for name, template in fitting.items():
+                score_map = match_scores(prepared, template, fft_shape)
+                peak_y, peak_x = numpy.unravel_index(int(score_map.argmax()), score_map.shape)
+                height, width = template.shape[:2]
+                results[name] = {
+                    "score": float(score_map[peak_y, peak_x]),
+                    "box": [int(peak_x) + offset_x, int(peak_y) + offset_y, width, height],
+                }
+
+        best_name = max(results, key=lambda name: results[name]["score"], default=None)
+        best = {"template": best_name, **results[best_name]} if best_name and results[best_name]["box"] else None
+        hit = best if best and best["score"] >= threshold else None
+        return {
+            "hit": hit,
+            "best": best,
+            "results": results,
+            "scores": {name: round(result["score"], 4) for name, result in results.items()},
+        }
+
+
+_banks: dict[tuple[str, ...], TemplateBank] = {}
+
+
+def get_template_bank(names: Sequence[str]) -> TemplateBank:
+    key = tuple(names)
+    bank = _banks.get(key)
+    if bank is None:
+        bank = _banks[key] = TemplateBank(key)
+    return bank
@@ -0,0 +1,24 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "agent"))
+
+
+class StubLogger:
+    def __init__(self):
+        self.records = []
+
+    def info(self, message):
+        self.records.append(json.loads(message))
+
+
+@pytest.fixture
+def profile_records(monkeypatch):
+    import profiling
+
+    logger = StubLogger()
+    monkeypatch.setattr(profiling, "_get_logger", lambda: logger)
+    return logger.records
@@ -0,0 +1,28 @@
+import json
+import time
+
+from checkpoint import RunCheckpoint
+from constants import CHECKPOINT_MAX_AGE
+
+
+def write_checkpoint(path, updated):
+    data = {"task_mode": None, "server_list": [1, 2, 3], "server_index": 1, "server_id": 2, "updated": updated}
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_recent_checkpoint_resumes(tmp_path):
+    path = tmp_path / "run_checkpoint.json"
+    write_checkpoint(path, time.time() - 60)
+    assert RunCheckpoint(path).resumable(None, [1, 2, 3])["server_index"] == 1
+
+
+def test_stale_checkpoint_is_rejected(tmp_path):
+    path = tmp_path / "run_checkpoint.json"
+    write_checkpoint(path, time.time() - CHECKPOINT_MAX_AGE - 60)
+    assert RunCheckpoint(path).resumable(None, [1, 2, 3]) is None
+
+
+def test_checkpoint_without_timestamp_is_rejected(tmp_path):
+    path = tmp_path / "run_checkpoint.json"
+    write_checkpoint(path, None)
+    assert RunCheckpoint(path).resumable(None, [1, 2, 3]) is None
@@ -0,0 +1,63 @@
+import numpy
+
+from constants import DIGIT_GLYPH_THRESHOLD
+from digit_glyph import DigitGlyphBank
+
+SEGMENTS = {
+    "0": "abcdef",
+    "1": "bch",
+    "2": "abdeg",
+    "3": "abcdg",
+    "4": "bcfg",
+    "5": "acdfg",
+    "6": "acdefg",
+    "7": "abc",
+    "8": "abcdefg",
+    "9": "abcdfg",
+}
+HEIGHT, WIDTH, STROKE = 20, 12, 2
+BOXES = {
+    "a": (0, 0, STROKE, WIDTH),
+    "b": (0, WIDTH - STROKE, HEIGHT // 2, STROKE),
+    "c": (HEIGHT // 2, WIDTH - STROKE, HEIGHT // 2, STROKE),
+    "d": (HEIGHT - STROKE, 0, STROKE, WIDTH),
+    "e": (HEIGHT // 2, 0, HEIGHT // 2, STROKE),
+    "f": (0, 0, HEIGHT // 2, STROKE),
+    "g": (HEIGHT // 2 - 1, 0, STROKE, WIDTH),
+    "h": (0, WIDTH - STROKE - 3, STROKE, 3),
+}
+
+
+def render(text: str):
+    gray = numpy.full((HEIGHT + 8, (WIDTH + 4) * len(text) + 4), 30, dtype=numpy.float32)
+    for index, digit in enumerate(text):
+        left = 4 + index * (WIDTH + 4)
+        for segment in SEGMENTS[digit]:
+            top, x, height, width = BOXES[segment]
+            gray[4 + top : 4 + top + height, left + x : left + x + width] = 220
+    return gray
+
+
+def read(bank: DigitGlyphBank, text: str, kind: str, alphabet: str = "0123456789"):
+    result = bank.classify(render(text), kind, alphabet)
+    return result.text if result and result.confidence >= DIGIT_GLYPH_THRESHOLD else None
+
+
+def test_partial_bank_reads_known_digits_and_rejects_unknown(tmp_path):
+    bank = DigitGlyphBank(tmp_path / "digit_glyphs.npz")
+    assert bank.learn(render("1234567"), "price", "1234567")
+    assert bank.learn(render("10"), "price", "10")
+
+    assert read(bank, "125", "price") == "125"
+    assert read(bank, "750", "price") == "750"
+    assert read(bank, "180", "price") is None
+    assert read(bank, "99", "price") is None
+
+
+def test_gift_count_outside_alphabet_is_rejected(tmp_path):
+    bank = DigitGlyphBank(tmp_path / "digit_glyphs.npz")
+    assert bank.learn(render("123"), "gift_count", "123")
+
+    assert read(bank, "2", "gift_count", "123") == "2"
+    for digit in "0456789":
+        assert read(bank, digit, "gift_count", "123") is None
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import numpy
+
+import profiling
+import row_ocr
+
+
+class StubContext:
+    def __init__(self):
+        self.calls = []
+
+    def run_recognition(self, reco_name, image, override=None):
+        roi = override[reco_name]["roi"]
+        self.calls.append(roi)
+        result = SimpleNamespace(text="1003区", box=[roi[0] + 20, roi[1] + 5, 80, 20], score=0.9)
+        return SimpleNamespace(hit=True, best_result=result, all_results=[result])
+
+
+def make_frame(seed: int):
+    image = numpy.full((720, 1280, 3), 40, dtype=numpy.uint8)
+    rng = numpy.random.default_rng(seed)
+    for row in range(5):
+        top = 316 + 8 + row * 50
+        image[top : top + 30, 442:862] = rng.integers(0, 256, (30, 420, 3))
+    return image
+
+
+def test_run_row_ocr_counts_rows_inside_profiled_call(monkeypatch, profile_records):
+    monkeypatch.setattr(row_ocr, "row_ocr_cache", row_ocr.RecognitionCache(16))
+    context = StubContext()
+
+    def analyze(context, argv):
+        return row_ocr.run_row_ocr(context, "ChooseServerButton", argv.image, [432, 316, 447, 252], ".*1003.*")
+
+    profiled = profiling._wrap("recognition", "LocateServerButton", analyze)
+    image = make_frame(0)
+    first = profiled(context, SimpleNamespace(node_name="ChooseServer", image=image))
+    second = profiled(context, SimpleNamespace(node_name="ChooseServer", image=image.copy()))
+
+    assert first.hit and second.hit
+    assert [result.box for result in first.all_results] == [result.box for result in second.all_results]
+    assert len(context.calls) == 1
+    assert [(record["ocr_rows"], record["cached_ocr_rows"]) for record in profile_records] == [(5, 0), (5, 5)]
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import numpy
+
+import common
+import profiling
+
+
+class StubContext:
+    def __init__(self, hits):
+        self.hits = hits
+        self.calls = []
+
+    def run_recognition(self, reco_name, image, override=None):
+        self.calls.append(reco_name)
+        if reco_name not in self.hits:
+            return SimpleNamespace(hit=False, best_result=None)
+        return SimpleNamespace(hit=True, best_result=SimpleNamespace(box=[0, 0, 10, 10]))
+
+
+def test_run_recognitions_stops_at_first_hit_inside_profiled_call(monkeypatch, profile_records):
+    monkeypatch.setattr(common, "recognition_cache", common.RecognitionCache(16))
+    context = StubContext({"CheckWelfare"})
+    reco_names = ["CheckAnnouncement", "CheckWelfare", "CheckReturnGift"]
+
+    def analyze(context, argv):
+        return common.run_recognitions(context, argv.image, reco_names, first_hit=True)
+
+    profiled = profiling._wrap("recognition", "DetectLoginPopup", analyze)
+    image = numpy.zeros((720, 1280, 3), dtype=numpy.uint8)
+    results = profiled(context, SimpleNamespace(node_name="LoginPopup", image=image))
+
+    assert context.calls == ["CheckAnnouncement", "CheckWelfare"]
+    assert [common.is_hit(result) for result in results[:2]] == [False, True]
+    assert results[2] is None
+    assert profile_records[0]["recognitions"] == 2
@@ -0,0 +1,37 @@
+from server_index import ServerListIndex
+
+
+def grid(base: int) -> dict[str, int]:
+    return {"base": base, "col_count": 2, "row_count": 5}
+
+
+def make_index(tmp_path) -> ServerListIndex:
+    index = ServerListIndex(tmp_path / "server_list_index.json")
+    for offset, base in ((0, 1200), (4, 1184), (8, 1168)):
+        index.record("1000", offset, grid(base))
+    return index
+
+
+def test_single_mismatch_does_not_shift_other_offsets(tmp_path):
+    index = make_index(tmp_path)
+    index.record("1000", 4, grid(1186))
+
+    assert [index.recorded_base("1000", offset) for offset in (0, 4, 8)] == [1200, 1186, 1168]
+
+
+def test_consistent_drift_shifts_all_offsets(tmp_path):
+    index = make_index(tmp_path)
+    index.record("1000", 0, grid(1202))
+    index.record("1000", 4, grid(1186))
+
+    assert [index.recorded_base("1000", offset) for offset in (0, 4, 8)] == [1202, 1186, 1170]
+    assert ServerListIndex(tmp_path / "server_list_index.json").recorded_base("1000", 8) == 1170
+
+
+def test_matching_offset_cancels_pending_drift(tmp_path):
+    index = make_index(tmp_path)
+    index.record("1000", 0, grid(1202))
+    index.record("1000", 8, grid(1168))
+    index.record("1000", 4, grid(1186))
+
+    assert [index.recorded_base("1000", offset) for offset in (0, 4, 8)] == [1202, 1186, 1168]
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import numpy
+
+import common
+from constants import SERVER_1000_LIST_ROI
+
+
+def server_list(texts):
+    results = [
+        SimpleNamespace(text=text, box=[100 + (index % 2) * 400, 100 + (index // 2) * 80, 200, 40])
+        for index, text in enumerate(texts)
+    ]
+    return SimpleNamespace(all_results=results)
+
+
+def test_recorded_base_needs_an_agreeing_anchor():
+    reco_detail = server_list(["区 甲", "区 乙", "1198区 丙", "区 丁"])
+
+    result, match_mode = common._find_server_by_layout(reco_detail, 1197, fallback_base=1200)
+
+    assert match_mode == "index_inferred"
+    assert result is reco_detail.all_results[3]
+
+
+def test_recorded_base_is_not_clicked_without_anchor():
+    reco_detail = server_list(["区 甲", "区 乙", "区 丙", "区 丁"])
+
+    assert common._find_server_by_layout(reco_detail, 1197, fallback_base=1200) == (None, None)
+
+
+def test_recorded_base_is_not_clicked_against_disagreeing_anchor():
+    reco_detail = server_list(["区 甲", "区 乙", "1196区 丙", "区 丁"])
+
+    assert common._find_server_by_layout(reco_detail, 1197, fallback_base=1200) == (None, None)
+
+
+def make_snapshot(image):
+    frame = SimpleNamespace(image=image, seq=7)
+    result = SimpleNamespace(text="1197区 丁", box=[500, 180, 200, 40])
+    return common.snapshot_server_list(frame, server_list([]), 1197, result, "exact")
+
+
+def test_snapshot_ignores_changes_outside_the_server_list():
+    image = numpy.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=numpy.uint8)
+    snapshot = make_snapshot(image)
+    changed = image.copy()
+    changed[:200] = 0
+
+    assert snapshot.matches(1197, changed)
+    assert not snapshot.matches(1198, changed)
+
+
+def test_snapshot_rejects_a_slightly_scrolled_server_list():
+    image = numpy.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=numpy.uint8)
+    snapshot = make_snapshot(image)
+    x, y, width, height = SERVER_1000_LIST_ROI
+    scrolled = image.copy()
+    scrolled[y : y + height - 4, x : x + width] = image[y + 4 : y + height, x : x + width]
+
+    assert not snapshot.matches(1197, scrolled)
@@ -0,0 +1,28 @@
+import numpy
+
+from template_match import TemplateBank, to_gray
+
+
+def make_frame(pixels):
+    rng = numpy.random.default_rng(0)
+    frame = rng.integers(0, 256, (200, 300, 3), dtype=numpy.uint8)
+    height, width = pixels.shape[:2]
+    frame[40 : 40 + height, 60 : 60 + width] = pixels
+    return frame
+
+
+def test_bank_rejects_desaturated_template(monkeypatch):
+    rng = numpy.random.default_rng(1)
+    pixels = numpy.zeros((24, 32, 3), dtype=numpy.uint8)
+    pixels[:, :, 2] = rng.integers(0, 256, (24, 32))
+    pixels[:, :, 0] = 255 - pixels[:, :, 2]
+    monkeypatch.setattr("template_match.load_color_template", lambda name: pixels.astype(numpy.float32))
+    bank = TemplateBank(["icon.png"])
+    desaturated = numpy.repeat(to_gray(pixels)[:, :, None], 3, axis=2).astype(numpy.uint8)
+
+    present = bank.match(make_frame(pixels), threshold=0.7)
+    faded = bank.match(make_frame(desaturated), threshold=0.7)
+
+    assert present["hit"]["box"] == [60, 40, 32, 24]
+    assert present["hit"]["score"] > 0.99
+    assert faded["hit"] is None
@@ -0,0 +1,175 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy
+from maa.agent_client import AgentClient
+from maa.context import Context
+from maa.controller import CustomController
+from maa.custom_recognition import CustomRecognition
+from maa.resource import Resource
+from maa.tasker import Tasker
+
+AGENT_MAIN = Path(__file__).parent.parent.resolve() / "agent" / "main.py"
+
+
+class StaticController(CustomController):
+    def __init__(self):
+        super().__init__()
+        rng = numpy.random.default_rng(0)
+        self.image = rng.integers(0, 256, (720, 1280, 3), dtype=numpy.uint8)
+
+    def connect(self) -> bool:
+        return True
+
+    def request_uuid(self) -> str:
+        return "benchmark-history"
+
+    def start_app(self, intent: str) -> bool:
+        return True
+
+    def stop_app(self, intent: str) -> bool:
+        return True
+
+    def screencap(self) -> numpy.ndarray:
+        return self.image
+
+    def click(self, x: int, y: int) -> bool:
+        return True
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int) -> bool:
+        return True
+
+    def touch_down(self, contact: int, x: int, y: int, pressure: int) -> bool:
+        return True
+
+    def touch_move(self, contact: int, x: int, y: int, pressure: int) -> bool:
+        return True
+
+    def touch_up(self, contact: int) -> bool:
+        return True
+
+    def click_key(self, keycode: int) -> bool:
+        return True
+
+    def input_text(self, text: str) -> bool:
+        return True
+
+    def key_down(self, keycode: int) -> bool:
+        return True
+
+    def key_up(self, keycode: int) -> bool:
+        return True
+
+
+class ServerStep(CustomRecognition):
+    def __init__(self):
+        super().__init__()
+        self.samples: list[tuple[int, float]] = []
+
+    def analyze(
+        self,
+        context: Context,
+        argv: CustomRecognition.AnalyzeArg,
+    ) -> CustomRecognition.AnalyzeResult:
+        start = time.perf_counter()
+        context.run_recognition("BenchStall", argv.image)
+        elapsed = time.perf_counter() - start
+
+        server_node = context.tasker.get_latest_node("GetNextServer")
+        server_id = server_node.recognition.best_result.detail.get("server_id") if server_node else None
+        self.samples.append((server_id, elapsed))
+        return CustomRecognition.AnalyzeResult(box=(0, 0, 1, 1), detail={})
+
+
+def build_pipeline(server_count: int, steps: int) -> dict:
+    def custom_node(recognition: str, param=None, next_names=None) -> dict:
+        node = {
+            "recognition": {
+                "type": "Custom",
+                "param": {"custom_recognition": recognition},
+            },
+            "pre_delay": 0,
+            "post_delay": 0,
+            "next": next_names or [],
+        }
+        if param is not None:
+            node["recognition"]["param"]["custom_recognition_param"] = param
+        return node
+
+    pipeline = {
+        "ParseServer": custom_node("ParseServerRange", f"1-{server_count}", ["GetNextServer"]),
+        "GetNextServer": custom_node("GetNextServer", None, ["AllServerCompleted", "BenchStep1"]),
+        "AllServerCompleted": custom_node("AllCompleted"),
+        "LoginMsg": {"pre_delay": 0, "post_delay": 0},
+        "BenchStall": custom_node("DetectStall", {"stall_seconds": 3600}),
+    }
+    for index in range(1, steps + 1):
+        next_name = f"BenchStep{index + 1}" if index < steps else "GetNextServer"
+        pipeline[f"BenchStep{index}"] = custom_node("BenchServerStep", None, [next_name])
+    return pipeline
+
+
+def run_benchmark(server_count: int, steps: int) -> list[float]:
+    controller = StaticController()
+    controller.post_connection().wait()
+
+    resource = Resource()
+    step = ServerStep()
+    resource.register_custom_recognition("BenchServerStep", step)
+
+    client = AgentClient()
+    client.bind(resource)
+    env = dict(os.environ, MAANOP_PROFILE="0")
+    with tempfile.TemporaryDirectory() as work_dir:
+        agent = subprocess.Popen([sys.executable, str(AGENT_MAIN), client.identifier], cwd=work_dir, env=env)
+        try:
+            if not client.connect():
+                raise RuntimeError("Failed to connect to agent")
+
+            tasker = Tasker()
+            tasker.bind(resource, controller)
+            if not tasker.inited:
+                raise RuntimeError("Failed to init tasker")
+
+            job = tasker.post_task("ParseServer", build_pipeline(server_count, steps)).wait()
+            client.disconnect()
+            if not job.succeeded:
+                raise RuntimeError("Benchmark task failed")
+        finally:
+            agent.wait(timeout=10)
+
+    per_server: dict[int, list[float]] = {}
+    for server_id, elapsed in step.samples:
+        per_server.setdefault(server_id, []).append(elapsed * 1000)
+    return [float(numpy.median(values)) for _, values in sorted(per_server.items())]
+
+
+def slope(values: list[float]) -> float:
+    x = numpy.arange(len(values), dtype=numpy.float64)
+    return float(numpy.polyfit(x, numpy.asarray(values), 1)[0]) if len(values) > 1 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recognition latency across a long server range.")
+    parser.add_argument("--servers", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=40)
+    parser.add_argument("--every", type=int, default=10)
+    args = parser.parse_args()
+
+    curve = run_benchmark(args.servers, args.steps)
+
+    print(f"{'server':>6} {'median ms':>10}")
+    for index in range(0, args.servers, args.every):
+        print(f"{index + 1:>6} {curve[index]:>10.3f}")
+    window = max(len(curve) // 10, 1)
+    growth = (sum(curve[-window:]) / window) / (sum(curve[:window]) / window)
+    print(f"slope {slope(curve):.4f} ms/server, last/first {growth:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve() / "agent"))
+
+from common import (  # noqa: E402
+    SERVER_GRID_COL_TOLERANCE,
+    SERVER_GRID_ROW_TOLERANCE,
+    _build_server_ocr_entries,
+    _cluster_entries,
+    _infer_server_grid_base,
+)
+
+
+def reference_cluster_entries(entries, coord_key, tolerance):
+    clusters = []
+
+    for entry in sorted(entries, key=lambda item: item[coord_key]):
+        coord = entry[coord_key]
+        for cluster in clusters:
+            if abs(coord - cluster["coord"]) <= tolerance:
+                cluster["members"].append(entry)
+                cluster["coord"] = sum(item[coord_key] for item in cluster["members"]) / len(cluster["members"])
+                break
+        else:
+            clusters.append({"coord": coord, "members": [entry]})
+
+    entry_to_cluster = {}
+    for cluster_index, cluster in enumerate(sorted(clusters, key=lambda item: item["coord"])):
+        for entry in cluster["members"]:
+            entry_to_cluster[entry["index"]] = cluster_index
+
+    return entry_to_cluster
+
+
+def make_results(box_count: int, rng: random.Random):
+    col_count = 4
+    top_server = 999
+    results = []
+    for grid_index in range(box_count):
+        row, col = divmod(grid_index, col_count)
+        x = 432 + col * 110 + rng.randint(-6, 6)
+        y = 316 + row * 36 + rng.randint(-3, 3)
+        text = f"{top_server - grid_index}区 火影忍者"
+        results.append(SimpleNamespace(text=text, box=[x, y, 80, 18]))
+
+    rng.shuffle(results)
+    return results
+
+
+def time_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server list layout inference.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 250, 500, 1000, 2000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'boxes':>6} {'cluster ms':>11} {'reference ms':>13} {'layout ms':>10} {'same':>5}")
+
+    for box_count in args.sizes:
+        results = make_results(box_count, rng)
+        entries = _build_server_ocr_entries(results)
+
+        same = all(
+            _cluster_entries(entries, key, tolerance) == reference_cluster_entries(entries, key, tolerance)
+            for key, tolerance in (("y", SERVER_GRID_ROW_TOLERANCE), ("x", SERVER_GRID_COL_TOLERANCE))
+        )
+        cluster_ms = time_call(lambda: _cluster_entries(entries, "y", SERVER_GRID_ROW_TOLERANCE), args.repeat)
+        reference_ms = time_call(
+            lambda: reference_cluster_entries(entries, "y", SERVER_GRID_ROW_TOLERANCE),
+            max(args.repeat // 10, 1),
+        )
+        layout_ms = time_call(lambda: _infer_server_grid_base(_build_server_ocr_entries(results)), args.repeat)
+
+        print(f"{box_count:>6} {cluster_ms:>11.3f} {reference_ms:>13.3f} {layout_ms:>10.3f} {str(same):>5}")
+        if not same:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy
+from maa.pipeline import JTemplateMatch
+from maa.resource import Resource
+from maa.tasker import Tasker
+
+from benchmark_history import StaticController
+
+ROOT_DIR = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(ROOT_DIR / "agent"))
+
+from constants import TEMPLATE_DEFAULT_THRESHOLD  # noqa: E402
+from template_match import decode_png, find_template_path, get_template_bank, load_color_template  # noqa: E402
+
+
+def load_cases(pipeline_path: Path, min_area: int) -> list[tuple[str, str, list[int]]]:
+    with open(pipeline_path, "r", encoding="utf-8") as f:
+        pipeline = json.load(f)
+
+    cases = []
+    seen = set()
+    for node_name, node in pipeline.items():
+        recognition = node.get("recognition") or {}
+        if recognition.get("type") != "TemplateMatch":
+            continue
+
+        param = recognition.get("param") or {}
+        template = param.get("template")
+        template = template[0] if isinstance(template, list) else template
+        roi = param.get("roi")
+        if not template or not roi or roi[2] * roi[3] < min_area or (template, tuple(roi)) in seen:
+            continue
+        if find_template_path(template) is None or roi[0] + roi[2] > 1280 or roi[1] + roi[3] > 720:
+            continue
+        height, width = load_color_template(template).shape[:2]
+        if width > roi[2] or height > roi[3]:
+            continue
+
+        seen.add((template, tuple(roi)))
+        cases.append((node_name, template, roi))
+    return cases
+
+
+def make_frame(template: str, roi: list[int], rng: numpy.random.Generator, case: str):
+    frame = rng.integers(0, 256, (720, 1280, 3), dtype=numpy.uint8)
+    frame = (frame.astype(numpy.uint16) + numpy.roll(frame, 1, axis=1)) // 2
+    frame = frame.astype(numpy.uint8)
+    if case == "absent":
+        return frame, None
+
+    pixels = decode_png(find_template_path(template))[:, :, :3]
+    if case == "recolored":
+        pixels = pixels[:, :, ::-1]
+    height, width = pixels.shape[:2]
+    x = roi[0] + int(rng.integers(0, max(roi[2] - width, 0) + 1))
+    y = roi[1] + int(rng.integers(0, max(roi[3] - height, 0) + 1))
+    frame[y : y + height, x : x + width] = pixels
+    return frame, (x - roi[0], y - roi[1])
+
+
+def time_call(func, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+class FrameworkMatcher:
+    def __init__(self):
+        self.controller = StaticController()
+        self.controller.post_connection().wait()
+        self.resource = Resource()
+        self.resource.post_bundle(ROOT_DIR / "assets" / "resource").wait()
+        self.tasker = Tasker()
+        self.tasker.bind(self.resource, self.controller)
+        if not self.tasker.inited:
+            raise RuntimeError("Failed to init tasker")
+
+    def match(self, frame, template: str, roi: list[int]) -> tuple[float, Optional[tuple[int, int]]]:
+        param = JTemplateMatch(template=[template], roi=tuple(roi), threshold=[0.0])
+        detail = self.tasker.post_recognition("TemplateMatch", param, frame).wait().get()
+        reco = detail.nodes[0].recognition if detail and detail.nodes else None
+        if reco is None or reco.box is None:
+            return 0.0, None
+        return float(reco.best_result.score), (reco.box.x - roi[0], reco.box.y - roi[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the agent template bank with framework template matching.")
+    parser.add_argument(
+        "--pipeline", type=Path, default=ROOT_DIR / "assets" / "resource" / "pipeline" / "leveling.json"
+    )
+    parser.add_argument("--min-area", type=int, default=100 * 100)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(args.seed)
+    cases = load_cases(args.pipeline, args.min_area)
+    framework = FrameworkMatcher()
+    print(f"{'node':<20} {'template':<36} {'case':<9} {'fw':>6} {'bank':>6} {'fw ms':>6} {'bank ms':>8} {'same':>5}")
+
+    totals = [0.0, 0.0]
+    mismatches = 0
+    for node_name, template, roi in cases:
+        bank = get_template_bank([template])
+        for case in ("present", "absent", "recolored"):
+            frame, _ = make_frame(template, roi, rng, case)
+
+            def bank_match():
+                result = bank.match(frame.copy(), roi)["results"][template]
+                return result["score"], (result["box"][0] - roi[0], result["box"][1] - roi[1])
+
+            bank_ms, (bank_score, bank_position) = time_call(bank_match, args.repeat)
+            framework_ms, (framework_score, framework_position) = time_call(
+                lambda: framework.match(frame, template, roi), args.repeat
+            )
+            totals[0] += framework_ms
+            totals[1] += bank_ms
+
+            framework_hit = framework_score >= TEMPLATE_DEFAULT_THRESHOLD
+            bank_hit = bank_score >= TEMPLATE_DEFAULT_THRESHOLD
+            same = framework_hit == bank_hit and (not framework_hit or bank_position == framework_position)
+            mismatches += not same
+            print(
+                f"{node_name:<20} {template:<36} {case:<9} {framework_score:>6.3f} {bank_score:>6.3f} "
+                f"{framework_ms:>6.3f} {bank_ms:>8.3f} {str(same):>5}"
+            )
+
+    print(f"total framework {totals[0]:.1f}ms, bank {totals[1]:.1f}ms, mismatches {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
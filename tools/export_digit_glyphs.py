@@ -0,0 +1,49 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy
+
+ROOT_DIR = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(ROOT_DIR / "agent"))
+
+from constants import DIGIT_GLYPH_IMAGE_DIR, DIGIT_GLYPH_PATH, DIGIT_GLYPH_SIZE  # noqa: E402
+from template_match import encode_png  # noqa: E402
+
+
+def glyph_pixels(vector) -> numpy.ndarray:
+    glyph = numpy.asarray(vector, dtype=numpy.float32).reshape(DIGIT_GLYPH_SIZE)
+    low, high = float(glyph.min()), float(glyph.max())
+    scaled = (glyph - low) / (high - low) if high > low else numpy.zeros_like(glyph)
+    return numpy.pad(numpy.rint(scaled * 255).astype(numpy.uint8), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export harvested digit glyphs as template images.")
+    parser.add_argument("--bank", type=Path, default=DIGIT_GLYPH_PATH)
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=ROOT_DIR / "assets" / "resource" / "image" / DIGIT_GLYPH_IMAGE_DIR,
+    )
+    args = parser.parse_args()
+
+    if not args.bank.exists():
+        print(f"Glyph bank not found: {args.bank}")
+        sys.exit(1)
+
+    count = 0
+    with numpy.load(args.bank) as data:
+        for key in sorted(data.files):
+            kind, digit = key.split("/")
+            kind_dir = args.output / kind
+            kind_dir.mkdir(parents=True, exist_ok=True)
+            for index, vector in enumerate(data[key]):
+                (kind_dir / f"{digit}_{index}.png").write_bytes(encode_png(glyph_pixels(vector)))
+                count += 1
+
+    print(f"Exported {count} glyphs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
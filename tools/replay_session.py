@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy
+from maa.agent_client import AgentClient
+from maa.controller import CustomController
+from maa.define import MaaControllerFeatureEnum
+from maa.resource import Resource
+from maa.tasker import Tasker
+
+ROOT_DIR = Path(__file__).parent.parent.resolve()
+AGENT_MAIN = ROOT_DIR / "agent" / "main.py"
+
+sys.path.insert(0, str(ROOT_DIR / "agent"))
+
+from constants import RECORD_EVENTS_FILE, RECORD_FRAME_DIR  # noqa: E402
+
+
+def load_events(session_dir: Path) -> list[dict[str, Any]]:
+    events = []
+    with open(session_dir / RECORD_EVENTS_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+class ReplayController(CustomController):
+    def __init__(self, session_dir: Path, tolerance: int = 4):
+        super().__init__()
+        self.session_dir = session_dir
+        self.tolerance = tolerance
+        self.events = load_events(session_dir)
+        self.position = 0
+        self.matched = 0
+        self.unmatched = 0
+        self.screencaps = 0
+        self.current_frame = next((event["frame"] for event in self.events if event["type"] == "frame"), None)
+        if self.current_frame is None:
+            raise ValueError(f"No frames recorded in {session_dir}")
+        self._touch_point: Optional[tuple[int, int]] = None
+
+    @lru_cache(maxsize=16)
+    def _load_frame(self, index: int) -> numpy.ndarray:
+        with numpy.load(self.session_dir / RECORD_FRAME_DIR / f"{index:06d}.npz") as data:
+            return data["frame"]
+
+    def _next_input(self) -> Optional[int]:
+        for index in range(self.position, len(self.events)):
+            if self.events[index]["type"] != "frame":
+                return index
+        return None
+
+    def _matches(self, event: dict[str, Any], kind: str, values: dict[str, Any]) -> bool:
+        if event["type"] != kind:
+            return False
+        if kind == "click":
+            return abs(event["x"] - values["x"]) <= self.tolerance and abs(event["y"] - values["y"]) <= self.tolerance
+        return all(event.get(key) == value for key, value in values.items())
+
+    def _consume(self, kind: str, **values: Any) -> bool:
+        index = self._next_input()
+        if index is None or not self._matches(self.events[index], kind, values):
+            self.unmatched += 1
+            return True
+
+        self.position = index + 1
+        self.matched += 1
+        return True
+
+    @property
+    def finished(self) -> bool:
+        return self._next_input() is None
+
+    def connect(self) -> bool:
+        return True
+
+    def request_uuid(self) -> str:
+        return f"replay-{self.session_dir.name}"
+
+    def get_features(self) -> int:
+        return MaaControllerFeatureEnum.Null
+
+    def start_app(self, intent: str) -> bool:
+        return True
+
+    def stop_app(self, intent: str) -> bool:
+        return True
+
+    def screencap(self) -> numpy.ndarray:
+        self.screencaps += 1
+        if self.position < len(self.events) and self.events[self.position]["type"] == "frame":
+            self.current_frame = self.events[self.position]["frame"]
+            self.position += 1
+        return self._load_frame(self.current_frame)
+
+    def click(self, x: int, y: int) -> bool:
+        return self._consume("click", x=x, y=y)
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int) -> bool:
+        return True
+
+    def touch_down(self, contact: int, x: int, y: int, pressure: int) -> bool:
+        self._touch_point = (x, y)
+        return True
+
+    def touch_move(self, contact: int, x: int, y: int, pressure: int) -> bool:
+        return True
+
+    def touch_up(self, contact: int) -> bool:
+        if self._touch_point is None:
+            return True
+        x, y = self._touch_point
+        self._touch_point = None
+        return self._consume("click", x=x, y=y)
+
+    def click_key(self, keycode: int) -> bool:
+        return self._consume("key", key=keycode)
+
+    def input_text(self, text: str) -> bool:
+        return self._consume("text", text=text)
+
+    def key_down(self, keycode: int) -> bool:
+        return True
+
+    def key_up(self, keycode: int) -> bool:
+        return self._consume("key", key=keycode)
+
+
+def replay(session_dir: Path, entry: str, resource_dir: Path, override: dict[str, Any], tolerance: int) -> bool:
+    controller = ReplayController(session_dir, tolerance)
+    controller.post_connection().wait()
+
+    resource = Resource()
+    resource.post_bundle(resource_dir).wait()
+
+    client = AgentClient()
+    client.bind(resource)
+    env = dict(os.environ, MAANOP_RECORD="0")
+    with tempfile.TemporaryDirectory() as work_dir:
+        agent = subprocess.Popen([sys.executable, str(AGENT_MAIN), client.identifier], cwd=work_dir, env=env)
+        try:
+            if not client.connect():
+                raise RuntimeError("Failed to connect to agent")
+
+            tasker = Tasker()
+            tasker.bind(resource, controller)
+            if not tasker.inited:
+                raise RuntimeError("Failed to init tasker")
+
+            start = time.perf_counter()
+            job = tasker.post_task(entry, override).wait()
+            elapsed = time.perf_counter() - start
+            client.disconnect()
+        finally:
+            agent.wait(timeout=10)
+
+    input_count = sum(1 for event in controller.events if event["type"] != "frame")
+    print(f"entry:      {entry}")
+    print(f"succeeded:  {job.succeeded}")
+    print(f"elapsed:    {elapsed:.3f}s")
+    print(f"screencaps: {controller.screencaps}")
+    print(f"inputs:     {controller.matched}/{input_count} matched, {controller.unmatched} unexpected")
+    return job.succeeded and controller.finished
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded agent session without the game window.")
+    parser.add_argument("session", type=Path)
+    parser.add_argument("entry")
+    parser.add_argument("--resource", type=Path, default=ROOT_DIR / "assets" / "resource")
+    parser.add_argument("--override", type=Path, help="pipeline override json")
+    parser.add_argument("--tolerance", type=int, default=4)
+    args = parser.parse_args()
+
+    override = {}
+    if args.override:
+        with open(args.override, "r", encoding="utf-8") as f:
+            override = json.load(f)
+
+    if not replay(args.session, args.entry, args.resource, override, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()